@@ -6,17 +6,35 @@ export interface PhotographSummary {
 	detection_count: number;
 }
 
+export interface PhotographPage {
+	photographs: PhotographSummary[];
+	next_cursor: string | null;
+}
+
+export interface PhotographFilters {
+	from?: string;
+	to?: string;
+	min_confidence?: number;
+	has_detections?: boolean;
+}
+
 export interface Detection {
 	tile_index: number;
 	confidence: number;
 	tile_url: string;
 }
 
+export interface TileGrid {
+	cols: number;
+	rows: number;
+}
+
 export interface PhotographDetail {
 	photograph_id: number;
 	captured_at: string;
 	image_url: string;
 	keep_all: boolean;
+	tile_grid: TileGrid | null;
 	detections: Detection[];
 }
 
@@ -30,8 +48,17 @@ export interface ShootResponse {
 	message: string;
 }
 
-export async function getPhotographs(limit = 50): Promise<PhotographSummary[]> {
-	const res = await fetch(`/api/photographs?limit=${limit}`);
+export async function getPhotographs(
+	limit = 50,
+	before: string | null = null,
+	filters: PhotographFilters = {}
+): Promise<PhotographPage> {
+	const params = new URLSearchParams({ limit: String(limit) });
+	if (before) params.set('before', before);
+	for (const [key, value] of Object.entries(filters)) {
+		if (value !== undefined) params.set(key, String(value));
+	}
+	const res = await fetch(`/api/photographs?${params}`);
 	if (!res.ok) throw new Error('Failed to fetch photographs');
 	return res.json();
 }
@@ -54,6 +81,32 @@ export async function triggerShoot(): Promise<ShootResponse> {
 	return res.json();
 }
 
+export interface EventHandlers {
+	onPhotograph?: (photo: PhotographDetail) => void;
+	onStats?: (stats: Stats) => void;
+}
+
+export function subscribeEvents(handlers: EventHandlers): () => void {
+	const source = new EventSource('/api/events');
+	source.addEventListener('photograph', (e) => {
+		handlers.onPhotograph?.(JSON.parse((e as MessageEvent).data));
+	});
+	source.addEventListener('stats', (e) => {
+		handlers.onStats?.(JSON.parse((e as MessageEvent).data));
+	});
+	return () => source.close();
+}
+
+export function toSummary(photo: PhotographDetail): PhotographSummary {
+	return {
+		photograph_id: photo.photograph_id,
+		captured_at: photo.captured_at,
+		image_path: photo.image_url.replace(/^\/images\//, ''),
+		keep_all: photo.keep_all,
+		detection_count: photo.detections.length
+	};
+}
+
 export function formatDate(isoString: string): string {
 	const date = new Date(isoString);
 	return date.toLocaleString();
@@ -2,8 +2,44 @@
 
 __version__ = "0.1.0"
 
-from pisky.camera import Camera, list_cameras
-from pisky.database import Database
-from pisky.detector import BirdDetector, Detection
+import importlib
 
-__all__ = ["Camera", "list_cameras", "Database", "BirdDetector", "Detection"]
+# Exports are imported on first use, so importing one light module (e.g. for
+# `pisky info` or the API server) doesn't load OpenCV and TFLite as well
+_EXPORTS = {
+    "Camera": "pisky.camera",
+    "list_cameras": "pisky.camera",
+    "CaptureSession": "pisky.capture",
+    "Database": "pisky.database",
+    "DatabasePool": "pisky.database",
+    "BirdDetector": "pisky.detector",
+    "Detection": "pisky.detector",
+    "InferenceEngine": "pisky.engine",
+    "ModelSpec": "pisky.models",
+    "resolve_model": "pisky.models",
+    "Tiler": "pisky.tiling",
+}
+
+__all__ = [
+    "Camera",
+    "list_cameras",
+    "CaptureSession",
+    "Database",
+    "DatabasePool",
+    "BirdDetector",
+    "Detection",
+    "InferenceEngine",
+    "ModelSpec",
+    "resolve_model",
+    "Tiler",
+]
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
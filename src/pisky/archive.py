@@ -0,0 +1,92 @@
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+from pisky.paths import get_archive_dir, get_images_dir
+
+
+def archive_name(filename: str) -> str:
+    """The archive holding an image: one per day, from the YYYYMMDD that starts every image filename."""
+    return f"{filename[:8]}.db"
+
+
+class DayArchive:
+    """One day's images packed into a single SQLite file.
+
+    Old captures then take one inode instead of thousands, and any image can
+    still be read back by name without scanning the archive.
+    """
+
+    def __init__(self, path: Path, readonly: bool = False) -> None:
+        self.path = path
+        self.readonly = readonly
+        self.conn: sqlite3.Connection | None = None
+
+    def open(self) -> None:
+        if self.readonly:
+            self.conn = sqlite3.connect(self.path.resolve().as_uri() + "?mode=ro", uri=True)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def add(self, images: Iterable[tuple[str, int, bytes]]) -> None:
+        """Store (name, mtime_ns, data) images in one transaction, replacing any with the same name.
+
+        `images` is consumed one at a time, so a generator can read each image as it is stored.
+        """
+        if self.conn is None:
+            raise RuntimeError("Archive not open")
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO images (name, mtime_ns, data) VALUES (?, ?, ?)", images)
+
+    def names(self) -> set[str]:
+        if self.conn is None:
+            raise RuntimeError("Archive not open")
+        return {row[0] for row in self.conn.execute("SELECT name FROM images")}
+
+    def get(self, name: str) -> tuple[bytes, int] | None:
+        """Return an image's (data, mtime_ns), or None if it isn't archived here."""
+        if self.conn is None:
+            raise RuntimeError("Archive not open")
+        row = self.conn.execute("SELECT data, mtime_ns FROM images WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    def __enter__(self) -> "DayArchive":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def read_archived(filename: str, archive_dir: Path | None = None) -> tuple[bytes, int] | None:
+    """Read an image that has been moved into its day's archive, as (data, mtime_ns)."""
+    if not filename[:8].isdigit():
+        return None
+    path = (archive_dir if archive_dir is not None else get_archive_dir()) / archive_name(filename)
+    if not path.exists():
+        return None
+    with DayArchive(path, readonly=True) as archive:
+        return archive.get(filename)
+
+
+def read_image_bytes(filename: str, images_dir: Path | None = None) -> bytes | None:
+    """An image's encoded bytes, whether it is still a file or has been archived."""
+    path = (images_dir if images_dir is not None else get_images_dir()) / filename
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        archived = read_archived(filename)
+        return archived[0] if archived is not None else None
@@ -0,0 +1,235 @@
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from numpy import ndarray  # noqa: E402
+
+from pisky.metrics import timed  # noqa: E402
+from pisky.models import BACKENDS, ModelSpec  # noqa: E402
+
+# Try tflite-runtime first (lighter, better ARM support), fall back to tensorflow
+try:
+    from tflite_runtime.interpreter import Interpreter, OpResolverType  # noqa: E402
+except ImportError:
+    import tensorflow as tf  # noqa: E402
+    Interpreter = tf.lite.Interpreter
+    OpResolverType = tf.lite.experimental.OpResolverType
+
+
+def pick_outputs(names: list[str], spec: ModelSpec) -> tuple[int, int, int]:
+    """Indices of the (boxes, classes, scores) outputs, by registry, name, then position."""
+    if spec.outputs is not None:
+        return spec.outputs
+    lowered = [name.lower() for name in names]
+    by_name = [next((i for i, name in enumerate(lowered) if key in name), None) for key in ("box", "class", "score")]
+    if None not in by_name:
+        return tuple(by_name)
+    # SSD post-processing order: boxes, classes, scores, count
+    return 0, 1, 2
+
+
+class Backend(ABC):
+    """Runs a detection model on RGB uint8 images at its input size.
+
+    infer() returns (boxes, classes, scores) with shapes (N, K, 4), (N, K) and
+    (N, K); boxes are (ymin, xmin, ymax, xmax), normalized to the image.
+    """
+
+    input_size: tuple[int, int] = (300, 300)
+    supports_batching: bool | None = False
+
+    @abstractmethod
+    def infer(self, images: Sequence[ndarray] | ndarray) -> tuple[ndarray, ndarray, ndarray]: ...
+
+
+def normalize(images: ndarray) -> ndarray:
+    """Scale uint8 pixels to [-1, 1], the usual input range of float detection models."""
+    return (images.astype(np.float32) - 127.5) / 127.5
+
+
+class TFLiteBackend(Backend):
+    """TensorFlow Lite, with optional control over threads and the XNNPACK delegate."""
+
+    def __init__(self, spec: ModelSpec, num_threads: int | None = None, xnnpack: bool | None = None) -> None:
+        # XNNPACK is one of TFLite's default delegates, so it is already on when the runtime has it.
+        # Leaving the default delegates out keeps the optimized built-in CPU kernels without it
+        resolver = {
+            None: OpResolverType.AUTO,
+            True: OpResolverType.AUTO,
+            False: OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES,
+        }[xnnpack]
+        self.interpreter = Interpreter(
+            model_path=str(spec.path),
+            num_threads=num_threads,
+            experimental_op_resolver_type=resolver,
+        )
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_size = tuple(int(d) for d in self.input_details[0]["shape"][1:3])
+        self.float_input = self.input_details[0]["dtype"] == np.float32
+        self.outputs = pick_outputs([d["name"] for d in self.output_details], spec)
+        self.batch_size = 1
+        # Unknown until a batch is first attempted; SSD post-processing ops often only run at batch 1
+        self.supports_batching = None
+
+    def _set_batch_size(self, n: int) -> bool:
+        """Resize the interpreter input to batch n. Returns False if the model can't batch."""
+        if n > 1 and self.supports_batching is False:
+            return False
+        if n == self.batch_size:
+            return True
+
+        batched = self._resize_input(n)
+        if n > 1:
+            self.supports_batching = batched
+            if not batched:
+                self._resize_input(1)
+                n = 1
+        self.batch_size = n
+        return batched
+
+    def _resize_input(self, n: int) -> bool:
+        """Resize and reallocate the input tensor. Returns True if the outputs follow batch n."""
+        input_index = self.input_details[0]["index"]
+        input_shape = list(self.input_details[0]["shape"])
+        try:
+            self.interpreter.resize_tensor_input(input_index, [n, *input_shape[1:]])
+            self.interpreter.allocate_tensors()
+        except (RuntimeError, ValueError):
+            return False
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        return all(self.output_details[i]["shape"][0] == n for i in self.outputs)
+
+    def _outputs(self) -> tuple[ndarray, ndarray, ndarray]:
+        return tuple(self.interpreter.get_tensor(self.output_details[i]["index"]) for i in self.outputs)
+
+    def infer(self, images: Sequence[ndarray] | ndarray) -> tuple[ndarray, ndarray, ndarray]:
+        n = len(images)
+        input_index = self.input_details[0]["index"]
+        if n > 1 and self._set_batch_size(n):
+            # Copy each image straight into the input tensor; the view must be gone before invoke()
+            input_tensor = self.interpreter.tensor(input_index)()
+            for i in range(n):
+                input_tensor[i] = normalize(images[i]) if self.float_input else images[i]
+            del input_tensor
+            with timed("invoke"):
+                self.interpreter.invoke()
+            return self._outputs()
+
+        # Model can't batch: feed images one at a time, writing straight into the input tensor
+        self._set_batch_size(1)
+        results = None
+        for i in range(n):
+            self.interpreter.tensor(input_index)()[0] = normalize(images[i]) if self.float_input else images[i]
+            with timed("invoke"):
+                self.interpreter.invoke()
+            outputs = self._outputs()
+            if results is None:
+                results = [np.empty((n, *out.shape[1:]), dtype=np.float32) for out in outputs]
+            for result, out in zip(results, outputs):
+                result[i] = out[0]
+        return tuple(results)
+
+
+class OnnxBackend(Backend):
+    """ONNX Runtime, for SSD-style models exported with post-processing (boxes, classes, scores)."""
+
+    def __init__(self, spec: ModelSpec, num_threads: int | None = None, xnnpack: bool | None = None) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("ONNX models need ONNX Runtime: pip install onnxruntime") from None
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or 0
+        options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+        if xnnpack and "XnnpackExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "XnnpackExecutionProvider")
+        self.session = ort.InferenceSession(str(spec.path), options, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape
+        self.channels_first = shape[1] == 3
+        dims = shape[2:4] if self.channels_first else shape[1:3]
+        if all(isinstance(d, int) for d in dims):
+            self.input_size = (dims[0], dims[1])
+        elif spec.input_size is not None:
+            self.input_size = spec.input_size
+        self.float_input = "float" in model_input.type
+        self.supports_batching = not isinstance(shape[0], int) or shape[0] != 1
+
+        outputs = self.session.get_outputs()
+        indices = pick_outputs([o.name for o in outputs], spec)
+        self.output_names = [outputs[i].name for i in indices]
+
+    def _run(self, batch: ndarray) -> list[ndarray]:
+        if self.float_input:
+            batch = normalize(batch)
+        if self.channels_first:
+            batch = batch.transpose(0, 3, 1, 2)
+        with timed("invoke"):
+            return self.session.run(self.output_names, {self.input_name: np.ascontiguousarray(batch)})
+
+    def infer(self, images: Sequence[ndarray] | ndarray) -> tuple[ndarray, ndarray, ndarray]:
+        batch = np.asarray(images)
+        if self.supports_batching:
+            boxes, classes, scores = self._run(batch)
+        else:
+            runs = [self._run(batch[i : i + 1]) for i in range(len(batch))]
+            boxes, classes, scores = (np.concatenate(outs) for outs in zip(*runs))
+        return boxes, classes.astype(np.float32), scores
+
+
+class OpenCVBackend(Backend):
+    """OpenCV DNN, for SSD models whose output is a DetectionOutput layer (e.g. TensorFlow .pb + .pbtxt)."""
+
+    def __init__(self, spec: ModelSpec, num_threads: int | None = None, xnnpack: bool | None = None) -> None:
+        self.net = cv2.dnn.readNet(str(spec.path), str(spec.config) if spec.config else "")
+        if num_threads:
+            # OpenCV's thread pool is process-wide
+            cv2.setNumThreads(num_threads)
+        self.input_size = spec.input_size or self.input_size
+        self.supports_batching = True
+
+    def infer(self, images: Sequence[ndarray] | ndarray) -> tuple[ndarray, ndarray, ndarray]:
+        n = len(images)
+        h, w = self.input_size
+        # Images are RGB already, so no channel swap
+        blob = cv2.dnn.blobFromImages(list(images), 1.0, (w, h), swapRB=False, crop=False)
+        self.net.setInput(blob)
+        with timed("invoke"):
+            output = self.net.forward()
+
+        # Rows of (image, class, score, xmin, ymin, xmax, ymax)
+        rows = output.reshape(-1, 7)
+        counts = np.bincount(rows[:, 0].astype(np.int64).clip(0, n - 1), minlength=n)
+        k = max(int(counts.max()), 1)
+        boxes = np.zeros((n, k, 4), dtype=np.float32)
+        classes = np.zeros((n, k), dtype=np.float32)
+        scores = np.zeros((n, k), dtype=np.float32)
+        filled = [0] * n
+        for image, label, score, xmin, ymin, xmax, ymax in rows.tolist():
+            i = min(max(int(image), 0), n - 1)
+            j = filled[i]
+            boxes[i, j] = (ymin, xmin, ymax, xmax)
+            classes[i, j] = label
+            scores[i, j] = score
+            filled[i] += 1
+        return boxes, classes, scores
+
+
+def load_backend(spec: ModelSpec, num_threads: int | None = None, xnnpack: bool | None = None) -> Backend:
+    backends = {"tflite": TFLiteBackend, "onnx": OnnxBackend, "opencv": OpenCVBackend}
+    if spec.backend not in backends:
+        raise ValueError(f"Unknown backend {spec.backend!r} for model {spec.name}; use one of {BACKENDS}")
+    if not spec.path.exists():
+        raise ValueError(f"Model file {spec.path} not found")
+    return backends[spec.backend](spec, num_threads, xnnpack)
@@ -0,0 +1,240 @@
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from loguru import logger
+from numpy import ndarray
+
+from pisky import __version__
+from pisky.models import ModelSpec, resolve_model
+from pisky.camera import Camera
+from pisky.capture import CaptureSession
+from pisky.metrics import metrics
+from pisky.motion import MotionGate
+from pisky.tiling import Tiler
+from pisky.writer import ImageWriter
+
+VIDEO_SUFFIXES = {".mp4", ".avi", ".mov", ".mkv", ".h264", ".mjpeg"}
+
+
+# Frames held in memory and replayed in a loop; few enough that they don't dominate peak RSS
+DISTINCT_FRAMES = 8
+
+
+def synthetic_frames(
+    count: int = DISTINCT_FRAMES,
+    width: int = 1920,
+    height: int = 1080,
+    seed: int = 0,
+) -> list[ndarray]:
+    """Noisy sky-like frames with a dark blob moving across, so every run sees the same pixels."""
+    rng = np.random.default_rng(seed)
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = (200, 170, 120)
+    frames = []
+    for i in range(count):
+        frame = cv2.add(background, rng.integers(0, 24, (height, width, 3), dtype=np.uint8))
+        x = int((i + 0.5) * width / count)
+        cv2.ellipse(frame, (x, height // 2), (60, 35), 0, 0, 360, (40, 40, 50), -1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(path: Path, limit: int = DISTINCT_FRAMES) -> list[ndarray]:
+    """Read up to `limit` recorded frames, spread evenly over a video file or a directory of images."""
+    frames = []
+    if path.is_dir():
+        image_paths = sorted(p for p in path.iterdir() if p.is_file())
+        step = max(1, len(image_paths) // limit)
+        for image_path in image_paths[::step]:
+            if len(frames) >= limit:
+                break
+            image = cv2.imread(str(image_path))
+            if image is not None:
+                frames.append(image)
+    elif path.suffix.lower() in VIDEO_SUFFIXES:
+        cap = cv2.VideoCapture(str(path))
+        step = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // limit)
+        index = 0
+        while len(frames) < limit:
+            # grab() without retrieve() skips decoding the frames in between
+            if index % step:
+                ret = cap.grab()
+            else:
+                ret, frame = cap.read()
+                if ret:
+                    frames.append(frame)
+            if not ret:
+                break
+            index += 1
+        cap.release()
+    else:
+        image = cv2.imread(str(path))
+        if image is not None:
+            frames.append(image)
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+class FrameReplay:
+    """Stands in for cv2.VideoCapture, looping over frames held in memory."""
+
+    def __init__(self, frames: list[ndarray]) -> None:
+        self.frames = frames
+        self.position = 0
+
+    def isOpened(self) -> bool:  # noqa: N802 - matches cv2.VideoCapture
+        return True
+
+    def read(self, image: ndarray | None = None) -> tuple[bool, ndarray]:
+        frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        # Like a camera, deliver into the caller's buffer when the size allows
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def release(self) -> None:
+        pass
+
+
+class ReplayCamera(Camera):
+    """A Camera that plays back recorded or synthetic frames."""
+
+    def __init__(self, frames: list[ndarray], tiler: Tiler | None = None) -> None:
+        super().__init__(0, tiler)
+        self.frames = frames
+
+    def open(self) -> bool:
+        self.cap = FrameReplay(self.frames)
+        return True
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_benchmark(
+    frames: list[ndarray],
+    iterations: int = 50,
+    warmup: int = 5,
+    workers: int | None = None,
+    tiler: Tiler | None = None,
+    motion: bool = False,
+    keep_all: bool = True,
+    jpeg_quality: int = 95,
+    model: ModelSpec | str | Path | None = None,
+    num_threads: int | None = None,
+    xnnpack: bool | None = None,
+) -> dict:
+    """Run frames through the full shoot pipeline into a throwaway data directory.
+
+    Captures are saved (keep_all) by default so JPEG encoding and database
+    writes are measured even when the model finds no birds.
+    """
+    # Resolved before the data directory moves, so the real model registry is used
+    model = resolve_model(model)
+    tiler = tiler if tiler is not None else Tiler()
+    previous_data_dir = os.environ.get("PISKY_DATA_DIR")
+    with tempfile.TemporaryDirectory(prefix="pisky-bench-") as data_dir:
+        os.environ["PISKY_DATA_DIR"] = data_dir
+        try:
+            session = CaptureSession(
+                workers=workers,
+                gate=MotionGate() if motion else None,
+                tiler=tiler,
+                writer=ImageWriter(quality=jpeg_quality),
+                model=model,
+                num_threads=num_threads,
+                xnnpack=xnnpack,
+            )
+            session.camera = ReplayCamera(frames, tiler)
+            with session:
+                for _ in range(warmup):
+                    session.shoot(keep_all)
+                session.writer.flush()
+                metrics.reset()
+
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    session.shoot(keep_all)
+                # Pending image writes are part of the cost of a frame
+                session.writer.flush()
+                elapsed = time.perf_counter() - started
+                workers = session.engine.workers
+                num_threads = session.engine.num_threads
+                input_size = session.engine.input_size
+        finally:
+            if previous_data_dir is None:
+                os.environ.pop("PISKY_DATA_DIR", None)
+            else:
+                os.environ["PISKY_DATA_DIR"] = previous_data_dir
+
+    plan = tiler.plan
+    logger.debug(f"Benchmarked {iterations} frames in {elapsed:.2f}s")
+    return {
+        "version": __version__,
+        "revision": git_revision(),
+        "host": {
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "release": platform.release(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "frame_size": [frames[0].shape[1], frames[0].shape[0]],
+            "distinct_frames": len(frames),
+            "iterations": iterations,
+            "warmup": warmup,
+            "model": model.name,
+            "backend": model.backend,
+            "input_size": list(input_size),
+            "workers": workers,
+            "threads_per_worker": num_threads,
+            "xnnpack": xnnpack,
+            "tiles": plan.inferences,
+            "tile_size": plan.tile_size,
+            "overlap": tiler.overlap,
+            "motion": motion,
+            "keep_all": keep_all,
+            "jpeg_quality": jpeg_quality,
+        },
+        "seconds": elapsed,
+        "fps": iterations / elapsed,
+        "stages": {
+            stage: {
+                "count": s["count"],
+                "mean_ms": s["mean"] * 1e3,
+                "p50_ms": s["p50"] * 1e3,
+                "p99_ms": s["p99"] * 1e3,
+            }
+            for stage, s in metrics.stages().items()
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
@@ -4,9 +4,8 @@ from pathlib import Path
 import cv2
 from numpy import ndarray
 
-TILE_SIZE = 300
-GRID_COLS = 6
-GRID_ROWS = 3
+from pisky.metrics import timed
+from pisky.tiling import GRID_COLS, GRID_ROWS, TILE_SIZE, Tiler  # noqa: F401
 
 
 def list_cameras(max_index: int = 10) -> list[tuple[int, str]]:
@@ -28,9 +27,10 @@ def list_cameras(max_index: int = 10) -> list[tuple[int, str]]:
 
 
 class Camera:
-    def __init__(self, index: int = 0) -> None:
+    def __init__(self, index: int = 0, tiler: Tiler | None = None) -> None:
         self.index = index
         self.cap: cv2.VideoCapture | None = None
+        self.tiler = tiler if tiler is not None else Tiler()
 
     def open(self) -> bool:
         self.cap = cv2.VideoCapture(self.index)
@@ -52,38 +52,16 @@ class Camera:
         return frame if ret else None
 
     def capture_tiles(self) -> tuple[ndarray | None, list[ndarray]]:
-        """Capture a frame and return the cropped image and 300x300 tiles."""
-        frame = self.capture()
-        if frame is None:
-            return None, []
-
-        h, w = frame.shape[:2]
-        crop_w = TILE_SIZE * GRID_COLS  # 1800
-        crop_h = TILE_SIZE * GRID_ROWS  # 900
-
-        # If frame is too small, resize it up
-        if w < crop_w or h < crop_h:
-            scale = max(crop_w / w, crop_h / h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            frame = cv2.resize(frame, (new_w, new_h))
-            h, w = frame.shape[:2]
-
-        # Crop to 1800x900 (centered)
-        x_offset = (w - crop_w) // 2
-        y_offset = (h - crop_h) // 2
-        cropped = frame[y_offset : y_offset + crop_h, x_offset : x_offset + crop_w]
+        """Capture a frame and return the tiled image and its tiles.
 
-        # Split into tiles
-        tiles = []
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                x = col * TILE_SIZE
-                y = row * TILE_SIZE
-                tile = cropped[y : y + TILE_SIZE, x : x + TILE_SIZE]
-                tiles.append(tile)
-
-        return cropped, tiles
+        Both are views into a buffer reused by the next capture.
+        """
+        if self.cap is None or not self.cap.isOpened():
+            return None, []
+        with timed("capture"):
+            if not self.tiler.read(self.cap):
+                return None, []
+        return self.tiler.image, self.tiler.tiles
 
     def __enter__(self) -> "Camera":
         if not self.open():
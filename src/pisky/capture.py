@@ -0,0 +1,283 @@
+import signal
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+
+from pisky.camera import Camera
+from pisky.database import Database
+from pisky.dedupe import Visit, VisitTracker, dhash
+from pisky.engine import InferenceEngine
+from pisky.motion import MotionGate, mean_luminance
+from pisky.metrics import timed
+from pisky.models import ModelSpec
+from pisky.paths import get_images_dir
+from pisky.preview import FrameHub
+from pisky.schedule import AdaptiveSchedule
+from pisky.tiling import Tiler, merge_detections
+from pisky.writer import ImageWriter
+
+
+class CaptureSession:
+    """Keeps the detector, camera and database open across captures."""
+
+    def __init__(
+        self,
+        camera_index: int = 0,
+        workers: int | None = None,
+        gate: MotionGate | None = None,
+        tiler: Tiler | None = None,
+        writer: ImageWriter | None = None,
+        preview: FrameHub | None = None,
+        model: ModelSpec | str | Path | None = None,
+        num_threads: int | None = None,
+        xnnpack: bool | None = None,
+        dark_threshold: float | None = None,
+        visits: VisitTracker | None = None,
+    ) -> None:
+        self.camera = Camera(camera_index, tiler)
+        self.db = Database()
+        self.writer = writer
+        self.preview = preview
+        self._last_second: str | None = None
+        # Captures from different threads (e.g. API requests) take turns on the camera
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.model = model
+        self.num_threads = num_threads
+        self.xnnpack = xnnpack
+        self.gate = gate
+        # Frames darker than this mean luminance (0-255) skip detection
+        self.dark_threshold = dark_threshold
+        self.last_detections: list = []
+        self.last_dark = False
+        # Groups repeat detections of the same scene so they aren't all saved
+        self.visits = visits
+        self.engine: InferenceEngine | None = None
+        self.images_dir = get_images_dir()
+
+    def open(self) -> None:
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.engine = InferenceEngine(self.workers, self.model, self.num_threads, self.xnnpack)
+        if not self.camera.open():
+            raise RuntimeError(f"Could not open camera at index {self.camera.index}")
+        self.db.open()
+        if self.visits is not None and self.visits.visit is None:
+            self._resume_visit()
+        if self.writer is None:
+            self.writer = ImageWriter()
+
+    def close(self) -> None:
+        self.camera.close()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.db.close()
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+    def _resume_visit(self) -> None:
+        """Continue the last stored visit, so captures from successive runs (e.g. `pisky shoot`) join it."""
+        last = self.db.get_last_visit()
+        if last is None or last["frame_hash"] is None:
+            return
+        self.visits.visit = Visit(
+            last["visit_id"],
+            datetime.fromisoformat(last["ended_at"]),
+            last["frame_hash"],
+            last["tile_hashes"],
+            last["best_confidence"] or 0.0,
+        )
+
+    def reload_model(self, model: ModelSpec | str | Path | None = None) -> ModelSpec:
+        """Switch the detector to another model (or reload the current one) between captures."""
+        if self.engine is None:
+            raise RuntimeError("Capture session not open")
+        with self._lock:
+            return self.engine.load_model(model)
+
+    def release_camera(self) -> None:
+        """Close the camera so other processes can use it; the next shoot reopens it."""
+        with self._lock:
+            self.camera.close()
+
+    def preview_frame(self) -> bool:
+        """Capture a frame for the live preview only, without running the detector."""
+        with self._lock:
+            if self.preview is None:
+                return False
+            if self.camera.cap is None and not self.camera.open():
+                raise RuntimeError(f"Could not open camera at index {self.camera.index}")
+            image, _ = self.camera.capture_tiles()
+            if image is None:
+                return False
+            self.preview.publish(self.camera.tiler.copy_bgr(image), self.camera.tiler.plan)
+            return True
+
+    def shoot(self, keep_all: bool = False) -> int | None:
+        """Capture a frame and detect birds. Returns photograph_id if saved."""
+        with self._lock, timed("shoot"):
+            return self._shoot(keep_all)
+
+    def _shoot(self, keep_all: bool) -> int | None:
+        if self.engine is None:
+            raise RuntimeError("Capture session not open")
+        if self.camera.cap is None and not self.camera.open():
+            raise RuntimeError(f"Could not open camera at index {self.camera.index}")
+
+        # A failed capture saw nothing, so the schedule mustn't act on the previous capture's results
+        self.last_dark = False
+        self.last_detections = []
+
+        now = datetime.now()
+        image, tiles = self.camera.capture_tiles()
+        if image is None:
+            logger.error("Could not capture frame")
+            # A dropped USB camera usually recovers after reopening
+            self.camera.close()
+            self.camera.open()
+            return None
+
+        # Night frames are rejected before the motion gate and model see them
+        self.last_dark = self.dark_threshold is not None and mean_luminance(image) < self.dark_threshold
+        if self.last_dark:
+            selected = []
+        # Only tiles that changed since recent frames are worth running the model on
+        elif self.gate is not None:
+            with timed("motion"):
+                selected = self.gate.select(tiles)
+        else:
+            selected = list(range(len(tiles)))
+        results = [[] for _ in tiles]
+        if selected:
+            self.camera.tiler.to_rgb()
+            with timed("detect"):
+                batch = self.engine.detect_batch([tiles[i] for i in selected], rgb=True)
+            for i, detections in zip(selected, batch):
+                results[i] = detections
+        elif not self.last_dark:
+            logger.debug("No motion, skipped inference")
+
+        # Merge birds seen by more than one tile, then collect results
+        merged = merge_detections(self.camera.tiler.plan, results)
+        all_detections = []
+        for det in merged:
+            logger.info(f"Tile {det.tile_index:02d}: bird detected (confidence: {det.confidence:.2f})")
+            all_detections.append((det.tile_index, det.confidence))
+        detected_tiles = {tile_index for tile_index, _ in all_detections}
+        self.last_detections = merged
+
+        # Live preview viewers see every analysed frame; the copy is only made while someone watches
+        if self.preview is not None and self.preview.viewers:
+            self.preview.publish(self.camera.tiler.copy_bgr(image), self.camera.tiler.plan, merged)
+
+        # Save images and log to database if we have detections or keep_all
+        if all_detections or keep_all:
+            with timed("hash"):
+                frame_hash = dhash(image)
+                tile_hashes = {i: dhash(tiles[i]) for i in detected_tiles}
+
+            action = None
+            if self.visits is not None and all_detections and not keep_all:
+                best = max(confidence for _, confidence in all_detections)
+                action = self.visits.observe(now, frame_hash, tile_hashes, best)
+                if action == "duplicate":
+                    self.db.extend_visit(self.visits.visit.visit_id, now, frame_hash=frame_hash, tile_hashes=tile_hashes)
+                    logger.info("Same visit as the last capture, not saved")
+                    return None
+
+            base_name = self._image_basename(now)
+            image_filename = f"{base_name}.jpg"
+
+            # Encoding and disk writes happen on the writer threads; they get a copy
+            # because the tiler reuses its buffer for the next frame. Only the frame
+            # is saved: tiles are cut from it on request, using the plan
+            tiler = self.camera.tiler
+            self.writer.submit(self.images_dir / image_filename, tiler.copy_bgr(image))
+            photograph_id = self.db.log_capture(
+                now, image_filename, keep_all, all_detections, frame_hash, tile_hashes, tiler.plan.cropped().to_json()
+            )
+            if action == "new":
+                self.visits.visit.visit_id = self.db.start_visit(photograph_id, now, best, frame_hash, tile_hashes)
+            elif action == "better":
+                self.db.extend_visit(
+                    self.visits.visit.visit_id, now, photograph_id, best, frame_hash, tile_hashes
+                )
+            logger.info(f"Saved {image_filename} with {len(all_detections)} detection(s)")
+            return photograph_id
+
+        logger.info("Too dark to look for birds" if self.last_dark else "No birds detected")
+        return None
+
+    def _image_basename(self, now: datetime) -> str:
+        """Timestamped file stem, with milliseconds added if the second was already used."""
+        base_name = now.strftime("%Y%m%d%H%M%S")
+        if base_name == self._last_second or (self.images_dir / f"{base_name}.jpg").exists():
+            self._last_second = base_name
+            return f"{base_name}-{now.microsecond // 1000:03d}"
+        self._last_second = base_name
+        return base_name
+
+    def __enter__(self) -> "CaptureSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def watch(
+    session: CaptureSession,
+    interval: float,
+    keep_all: bool = False,
+    stop: threading.Event | None = None,
+    schedule: AdaptiveSchedule | None = None,
+) -> None:
+    """Capture every `interval` seconds until `stop` is set or SIGTERM arrives.
+
+    With a schedule, the wait instead follows recent detections and daylight.
+    SIGHUP reloads the model, picking up a new registry default or model file.
+    """
+    if stop is None:
+        stop = threading.Event()
+    reload = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: reload.set())
+
+    if schedule is not None:
+        logger.info(
+            f"Watching camera {session.camera.index} every {interval:g}-{schedule.max_interval:g}s, "
+            f"every {schedule.burst_interval:g}s after a bird"
+        )
+    else:
+        logger.info(f"Watching camera {session.camera.index} every {interval:g}s")
+    # Gate frames at the last summary; dark frames and failed captures don't advance the count
+    gate_logged = 0
+    while not stop.is_set():
+        started = time.monotonic()
+        if reload.is_set():
+            reload.clear()
+            try:
+                session.reload_model()
+            except Exception:
+                logger.exception("Could not reload the model, keeping the current one")
+        delay = interval
+        try:
+            session.shoot(keep_all)
+            if schedule is not None:
+                delay = schedule.next_delay(bool(session.last_detections), session.last_dark)
+        except Exception:
+            logger.exception("Capture failed")
+        if session.gate is not None and session.gate.frames // 100 > gate_logged // 100:
+            gate_logged = session.gate.frames
+            logger.info(f"Motion gate: {session.gate.summary()}")
+        stop.wait(max(0.0, delay - (time.monotonic() - started)))
+
+    if session.gate is not None:
+        logger.info(f"Motion gate: {session.gate.summary()}")
+    logger.info("Stopped watching")
@@ -1,26 +1,236 @@
-from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
-import cv2
-from loguru import logger
 
-from pisky.camera import GRID_COLS, GRID_ROWS, TILE_SIZE, Camera, list_cameras
-from pisky.database import Database
-from pisky.detector import BirdDetector
+from pisky.grid import TILE_SIZE
 from pisky.paths import (
     MODEL_URL,
+    get_cache_dir,
     get_data_dir,
     get_database_path,
     get_images_dir,
     get_model_path,
+    get_models_dir,
+    load_env,
 )
+from pisky.metrics import metrics
+
+if TYPE_CHECKING:
+    from pisky.dedupe import VisitTracker
+    from pisky.schedule import AdaptiveSchedule
+    from pisky.tiling import Tiler
+
+# Commands import OpenCV, the detector and the camera themselves, so `pisky info`,
+# `pisky serve` and --help don't pay for loading them. `pisky startup` checks this.
+
+
+def tiling_options(f):
+    """Add the tile grid options shared by the detection commands."""
+    f = click.option(
+        "--overlap",
+        type=click.IntRange(0, TILE_SIZE - 1),
+        default=0,
+        help="Pixels of overlap between neighbouring tiles (default: 0)",
+    )(f)
+    f = click.option(
+        "--tiling",
+        type=click.Choice(["crop", "full"]),
+        default="crop",
+        help="crop: fixed grid centered in the frame; full: cover the whole frame (default: crop)",
+    )(f)
+    return f
+
+
+def model_options(f):
+    """Add the model and inference tuning options shared by the detection commands."""
+    f = click.option(
+        "--xnnpack/--no-xnnpack",
+        default=None,
+        help=(
+            "Use the XNNPACK CPU delegate or not (default: on for TFLite when the runtime has it, "
+            "off for ONNX Runtime)"
+        ),
+    )(f)
+    f = click.option(
+        "--threads",
+        "num_threads",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Inference threads per worker (default: CPU cores / workers)",
+    )(f)
+    f = click.option(
+        "--model",
+        default=None,
+        help="Registry name (see `pisky models`) or model file (default: PISKY_MODEL or the registry default)",
+    )(f)
+    return f
+
+
+def workers_option(f):
+    """Add the number of parallel inference workers."""
+    return click.option(
+        "--workers",
+        type=click.IntRange(min=1),
+        default=None,
+        envvar="PISKY_WORKERS",
+        help="Parallel inference workers (default: one per CPU core)",
+    )(f)
+
+
+def jpeg_quality_option(f):
+    """Add the JPEG quality of saved images."""
+    return click.option(
+        "--jpeg-quality",
+        type=click.IntRange(0, 100),
+        default=95,
+        help="JPEG quality for saved images (default: 95)",
+    )(f)
+
+
+def keep_all_option(f):
+    """Add --keep-all, which saves frames without birds too."""
+    return click.option("--keep-all", is_flag=True, help="Keep all images even if no birds detected")(f)
+
+
+def motion_options(f):
+    """Add the motion gate options shared by the capture loops."""
+    f = click.option(
+        "--motion-threshold",
+        type=click.FloatRange(min=0, max=1),
+        default=0.01,
+        help="Fraction of a tile's pixels that must change to run detection (default: 0.01)",
+    )(f)
+    f = click.option(
+        "--motion/--no-motion",
+        default=True,
+        help="Only run detection on tiles that changed since recent frames (default: on)",
+    )(f)
+    return f
+
+
+def profile_option(f):
+    """Add --profile, which prints per-stage timings when the command finishes."""
+    return click.option(
+        "--profile",
+        is_flag=True,
+        help="Print how long each pipeline stage took when done",
+    )(f)
+
+
+def dark_option(f):
+    """Add the dark frame threshold shared by the capture commands."""
+    return click.option(
+        "--dark-threshold",
+        type=click.FloatRange(0, 255),
+        default=20.0,
+        help="Skip detection on frames darker than this mean brightness, 0-255; 0 turns it off (default: 20)",
+    )(f)
+
+
+# Default visit gaps: the shortest for capture loops, and one that outlasts a 5-minute `pisky shoot` timer
+MIN_VISIT_GAP = 60.0
+SHOOT_VISIT_GAP = 600.0
+
+
+def dedupe_options(f):
+    """Add the near-duplicate capture options shared by the capture commands."""
+    f = click.option(
+        "--visit-gap",
+        type=click.FloatRange(min=0),
+        default=None,
+        help=(
+            "Seconds without a bird that end a visit (default: two capture intervals, at least 60; "
+            f"{SHOOT_VISIT_GAP:g} for `shoot`, e.g. on a timer)"
+        ),
+    )(f)
+    f = click.option(
+        "--dedupe-distance",
+        type=click.IntRange(0, 64),
+        default=8,
+        help="Bits of the 64-bit image hashes that may differ for a capture to count as a repeat (default: 8)",
+    )(f)
+    f = click.option(
+        "--dedupe/--no-dedupe",
+        default=True,
+        help="Save only the first and best frames of a bird's visit, not every near-identical capture (default: on)",
+    )(f)
+    return f
+
+
+def make_visits(
+    dedupe: bool,
+    dedupe_distance: int,
+    visit_gap: float | None,
+    interval: float | None = None,
+) -> "VisitTracker | None":
+    """Visit tracker for a capture loop running every `interval` seconds, or for one-off shoots without one.
+
+    Without an explicit gap, a visit survives one missed capture, so it must
+    be longer than the time between captures.
+    """
+    if not dedupe:
+        return None
+    from pisky.dedupe import VisitTracker
+
+    if visit_gap is None:
+        visit_gap = max(MIN_VISIT_GAP, 2 * interval) if interval is not None else SHOOT_VISIT_GAP
+    return VisitTracker(dedupe_distance, visit_gap)
+
+
+def schedule_options(f):
+    """Add the adaptive capture schedule options shared by `watch` and `serve`."""
+    f = click.option(
+        "--max-interval",
+        type=click.FloatRange(min=0),
+        default=300.0,
+        help="Longest wait between captures with --adaptive, also used while dark (default: 300)",
+    )(f)
+    f = click.option(
+        "--burst-minutes",
+        type=click.FloatRange(min=0),
+        default=5.0,
+        help="How long a burst lasts after the last bird with --adaptive (default: 5)",
+    )(f)
+    f = click.option(
+        "--burst-interval",
+        type=click.FloatRange(min=0),
+        default=2.0,
+        help="Seconds between captures after a bird is seen with --adaptive (default: 2)",
+    )(f)
+    f = click.option(
+        "--adaptive",
+        is_flag=True,
+        help="Capture faster after a detection and back off while nothing is seen",
+    )(f)
+    return f
+
+
+def make_schedule(
+    adaptive: bool,
+    interval: float,
+    burst_interval: float,
+    burst_minutes: float,
+    max_interval: float,
+) -> "AdaptiveSchedule | None":
+    if not adaptive:
+        return None
+    from pisky.schedule import AdaptiveSchedule
+
+    return AdaptiveSchedule(interval, burst_interval, burst_minutes * 60, max_interval)
+
+
+def make_tiler(tiling: str, overlap: int) -> "Tiler":
+    from pisky.tiling import Tiler
+
+    return Tiler.for_tiling(tiling, overlap)
 
 
 @click.group()
 @click.version_option()
 def cli() -> None:
     """Pi in the Sky - Bird detection from webcam."""
-    pass
+    load_env()
 
 
 @cli.command("info")
@@ -33,13 +243,30 @@ def info_cmd() -> None:
     click.echo(f"  Data directory: {get_data_dir()}")
     click.echo(f"  Images:         {get_images_dir()}")
     click.echo(f"  Database:       {get_database_path()}")
+    click.echo(f"  Cache:          {get_cache_dir()}")
     click.echo(f"  Model:          {model_path} ({model_status})")
     click.echo(f"  Model source:   {MODEL_URL}")
 
 
+@cli.command("models")
+def models_cmd() -> None:
+    """List models in the registry."""
+    from pisky.models import REGISTRY_FILENAME, load_registry, model_spec
+
+    registry = load_registry()
+    click.echo(f"Models ({get_models_dir() / REGISTRY_FILENAME}):")
+    for name, entry in registry["models"].items():
+        spec = model_spec(name, entry)
+        marker = "*" if name == registry["default"] else " "
+        status = "" if spec.path.exists() else " (missing)"
+        click.echo(f"  {marker} {name}: {spec.backend}, {spec.path.name}, bird class {spec.bird_class}{status}")
+
+
 @cli.command("list")
 def list_cmd() -> None:
     """List available cameras."""
+    from pisky.camera import list_cameras
+
     cameras = list_cameras()
     if cameras:
         click.echo("Available cameras:")
@@ -50,57 +277,161 @@ def list_cmd() -> None:
 
 
 @cli.command("shoot")
-@click.option("--keep-all", is_flag=True, help="Keep all images even if no birds detected")
+@keep_all_option
 @click.option("--camera", "camera_index", type=int, default=0, help="Camera index (default: 0)")
-def shoot_cmd(keep_all: bool, camera_index: int) -> int | None:
+@workers_option
+@tiling_options
+@jpeg_quality_option
+@dark_option
+@dedupe_options
+@model_options
+@profile_option
+def shoot_cmd(
+    keep_all: bool,
+    camera_index: int,
+    workers: int | None,
+    tiling: str,
+    overlap: int,
+    jpeg_quality: int,
+    dark_threshold: float,
+    dedupe: bool,
+    dedupe_distance: int,
+    visit_gap: float | None,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+    profile: bool,
+) -> int | None:
     """Capture image and detect birds. Returns photograph_id if saved."""
-    images_dir = get_images_dir()
-    images_dir.mkdir(parents=True, exist_ok=True)
-
-    now = datetime.now()
-    timestamp = now.strftime("%Y%m%d%H%M%S")
-
-    detector = BirdDetector()
-    logger.info("Bird detector loaded")
-
-    with Camera(camera_index) as cam, Database() as db:
-        image, tiles = cam.capture_tiles()
-        if image is not None:
-            image_filename = f"{timestamp}.jpg"
-            image_path = images_dir / image_filename
-
-            # Run detection on each tile, collect results
-            all_detections = []
-            for i, tile in enumerate(tiles):
-                detections = detector.detect(tile)
-                if detections or keep_all:
-                    tile_path = images_dir / f"{timestamp}_{i:02d}.jpg"
-                    cv2.imwrite(str(tile_path), tile)
-                for det in detections:
-                    logger.info(f"Tile {i:02d}: bird detected (confidence: {det.confidence:.2f})")
-                    all_detections.append((i, det.confidence))
-
-            # Save image and log to database if we have detections or keep_all
-            if all_detections or keep_all:
-                cv2.imwrite(str(image_path), image)
-                photograph_id = db.log_photograph(now, image_filename, keep_all)
-                for tile_index, confidence in all_detections:
-                    db.log_detection(photograph_id, tile_index, confidence)
-                logger.info(f"Saved {image_filename} with {len(all_detections)} detection(s)")
-                return photograph_id
-            else:
-                logger.info("No birds detected")
-                return None
-        else:
-            logger.error("Could not capture frame")
-            return None
+    from pisky.capture import CaptureSession
+    from pisky.writer import ImageWriter
+
+    with CaptureSession(
+        camera_index,
+        workers,
+        tiler=make_tiler(tiling, overlap),
+        writer=ImageWriter(quality=jpeg_quality),
+        model=model,
+        num_threads=num_threads,
+        xnnpack=xnnpack,
+        dark_threshold=dark_threshold or None,
+        visits=make_visits(dedupe, dedupe_distance, visit_gap),
+    ) as session:
+        photograph_id = session.shoot(keep_all)
+    # The session has closed, so the writer's encode and write timings are in
+    if profile:
+        click.echo(metrics.summary())
+    return photograph_id
+
+
+@cli.command("watch")
+@keep_all_option
+@click.option("--camera", "camera_index", type=int, default=0, help="Camera index (default: 0)")
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5.0,
+    help="Seconds between captures (default: 5)",
+)
+@click.option(
+    "--fps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Capture continuously at this frame rate (overrides --interval)",
+)
+@schedule_options
+@dark_option
+@dedupe_options
+@workers_option
+@motion_options
+@tiling_options
+@jpeg_quality_option
+@model_options
+@profile_option
+def watch_cmd(
+    keep_all: bool,
+    camera_index: int,
+    interval: float,
+    fps: float | None,
+    adaptive: bool,
+    burst_interval: float,
+    burst_minutes: float,
+    max_interval: float,
+    dark_threshold: float,
+    dedupe: bool,
+    dedupe_distance: int,
+    visit_gap: float | None,
+    workers: int | None,
+    motion: bool,
+    motion_threshold: float,
+    tiling: str,
+    overlap: int,
+    jpeg_quality: int,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+    profile: bool,
+) -> None:
+    """Capture continuously, keeping the camera and detector loaded.
+
+    With --adaptive, captures speed up after a bird is seen and slow down while
+    nothing is. Send SIGHUP to reload the model, e.g. after changing the registry default.
+    """
+    from loguru import logger
+
+    from pisky.capture import CaptureSession, watch
+    from pisky.motion import MotionGate
+    from pisky.writer import ImageWriter
+
+    if fps is not None:
+        interval = 1.0 / fps
+    gate = MotionGate(motion_threshold) if motion else None
+
+    with CaptureSession(
+        camera_index,
+        workers,
+        gate,
+        make_tiler(tiling, overlap),
+        ImageWriter(quality=jpeg_quality),
+        model=model,
+        num_threads=num_threads,
+        xnnpack=xnnpack,
+        dark_threshold=dark_threshold or None,
+        visits=make_visits(dedupe, dedupe_distance, visit_gap, interval),
+    ) as session:
+        try:
+            schedule = make_schedule(adaptive, interval, burst_interval, burst_minutes, max_interval)
+            watch(session, interval, keep_all, schedule=schedule)
+        except KeyboardInterrupt:
+            logger.info("Interrupted")
+    if profile:
+        click.echo(metrics.summary())
 
 
 @cli.command("test")
 @click.argument("image_path", type=click.Path(exists=True))
 @click.option("--debug", is_flag=True, help="Show all detected classes, not just birds")
-def test_cmd(image_path: str, debug: bool) -> None:
+@workers_option
+@tiling_options
+@model_options
+@profile_option
+def test_cmd(
+    image_path: str,
+    debug: bool,
+    workers: int | None,
+    tiling: str,
+    overlap: int,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+    profile: bool,
+) -> None:
     """Test detection on an image file without saving to database."""
+    import cv2
+
+    from pisky.engine import InferenceEngine
+    from pisky.tiling import merge_detections
+
     image = cv2.imread(image_path)
     if image is None:
         click.echo(f"Error: Could not read {image_path}")
@@ -108,59 +439,444 @@ def test_cmd(image_path: str, debug: bool) -> None:
 
     click.echo(f"Image size: {image.shape[1]}x{image.shape[0]}")
 
-    # Tile the image
-    h, w = image.shape[:2]
-    crop_w = TILE_SIZE * GRID_COLS
-    crop_h = TILE_SIZE * GRID_ROWS
-
-    if w < crop_w or h < crop_h:
-        scale = max(crop_w / w, crop_h / h)
-        image = cv2.resize(image, (int(w * scale), int(h * scale)))
-        h, w = image.shape[:2]
-
-    x_offset = (w - crop_w) // 2
-    y_offset = (h - crop_h) // 2
-    cropped = image[y_offset : y_offset + crop_h, x_offset : x_offset + crop_w]
-
-    tiles = []
-    for row in range(GRID_ROWS):
-        for col in range(GRID_COLS):
-            x = col * TILE_SIZE
-            y = row * TILE_SIZE
-            tile = cropped[y : y + TILE_SIZE, x : x + TILE_SIZE]
-            tiles.append(tile)
+    tiler = make_tiler(tiling, overlap)
+    tiler.load(image)
+    cropped, tiles = tiler.image, tiler.tiles
 
     click.echo(f"Cropped to: {cropped.shape[1]}x{cropped.shape[0]}, {len(tiles)} tiles")
 
-    detector = BirdDetector()
-    click.echo("Running detection...")
+    with InferenceEngine(workers, model, num_threads, xnnpack) as detector:
+        click.echo(f"Running detection ({detector.workers} worker(s))...")
 
-    total = 0
-    for i, tile in enumerate(tiles):
         if debug:
-            all_detections = detector.detect_all(tile, min_confidence=0.1)
-            if all_detections:
-                click.echo(f"  Tile {i:02d}: {all_detections}")
+            for i, tile in enumerate(tiles):
+                all_detections = detector.detect_all(tile, min_confidence=0.1)
+                if all_detections:
+                    click.echo(f"  Tile {i:02d}: {all_detections}")
 
-        detections = detector.detect(tile, min_confidence=0)
-        for det in detections:
-            marker = "✓" if det.confidence >= 0.33 else " "
-            click.echo(f"  {marker} Tile {i:02d}: bird (confidence: {det.confidence:.2f})")
-            if det.confidence >= 0.33:
-                total += 1
+        tiler.to_rgb()
+        results = detector.detect_batch(tiles, min_confidence=0, rgb=True)
+
+    total = 0
+    for det in sorted(merge_detections(tiler.plan, results), key=lambda d: d.tile_index):
+        marker = "✓" if det.confidence >= 0.33 else " "
+        click.echo(f"  {marker} Tile {det.tile_index:02d}: bird (confidence: {det.confidence:.2f})")
+        if det.confidence >= 0.33:
+            total += 1
 
     click.echo(f"Total: {total} detection(s) above threshold")
+    if profile:
+        click.echo(metrics.summary())
+
+
+@cli.command("tiles")
+@click.option("--width", type=click.IntRange(min=1), default=1920, help="Frame width (default: 1920)")
+@click.option("--height", type=click.IntRange(min=1), default=1080, help="Frame height (default: 1080)")
+@tiling_options
+def tiles_cmd(width: int, height: int, tiling: str, overlap: int) -> None:
+    """Show the tile grid and inference cost for a frame size."""
+    plan = make_tiler(tiling, overlap).plan_for(width, height)
+    scale = plan.frame_w / width
+
+    click.echo(f"Frame:       {width}x{height}" + (f" (upscaled x{scale:.2f})" if scale > 1 else ""))
+    click.echo(f"Grid:        {plan.cols}x{plan.rows} tiles of {plan.tile_size}px")
+    click.echo(f"Step:        {plan.step_x}px across, {plan.step_y}px down")
+    click.echo(f"Tiled area:  {plan.width}x{plan.height} at ({plan.x_offset}, {plan.y_offset})")
+    click.echo(f"Coverage:    {plan.coverage:.0%} of the frame")
+    click.echo(f"Inferences:  {plan.inferences} per frame")
+
+
+@cli.command("bench")
+@click.option(
+    "--input",
+    "input_path",
+    type=click.Path(exists=True, path_type=Path),
+    default=None,
+    help="Video file, image or directory of images to replay (default: synthetic frames)",
+)
+@click.option("--iterations", type=click.IntRange(min=1), default=50, help="Frames to time (default: 50)")
+@click.option("--warmup", type=click.IntRange(min=0), default=5, help="Untimed frames first (default: 5)")
+@workers_option
+@click.option("--motion/--no-motion", default=False, help="Gate tiles on motion, as watch does (default: off)")
+@click.option(
+    "--keep-all/--detections-only",
+    default=True,
+    help="Save every frame so encoding and database writes are measured (default: keep all)",
+)
+@tiling_options
+@jpeg_quality_option
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the results as JSON to this file (default: print them)",
+)
+@model_options
+def bench_cmd(
+    input_path: Path | None,
+    iterations: int,
+    warmup: int,
+    workers: int | None,
+    motion: bool,
+    keep_all: bool,
+    tiling: str,
+    overlap: int,
+    jpeg_quality: int,
+    output: Path | None,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+) -> None:
+    """Benchmark capture, detection and saving offline, without a camera."""
+    import json
+    import sys
+
+    from loguru import logger
+
+    from pisky.bench import load_frames, run_benchmark, synthetic_frames
+
+    # Per-frame logging would dominate the timings
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    try:
+        frames = load_frames(input_path) if input_path is not None else synthetic_frames()
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    results = run_benchmark(
+        frames,
+        iterations=iterations,
+        warmup=warmup,
+        workers=workers,
+        tiler=make_tiler(tiling, overlap),
+        motion=motion,
+        keep_all=keep_all,
+        jpeg_quality=jpeg_quality,
+        model=model,
+        num_threads=num_threads,
+        xnnpack=xnnpack,
+    )
+
+    click.echo(f"{results['fps']:.2f} frames/s over {iterations} frames, peak RSS {results['peak_rss_mb']:.0f} MB", err=True)
+    click.echo(metrics.summary(), err=True)
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2) + "\n")
+        click.echo(f"Results written to {output}", err=True)
+    else:
+        click.echo(json.dumps(results, indent=2))
+
+
+@cli.command("reprocess")
+@click.argument("source", required=False, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--min-confidence",
+    type=click.FloatRange(0, 1),
+    default=0.33,
+    help="Confidence a bird needs to be recorded (default: 0.33)",
+)
+@workers_option
+@tiling_options
+@click.option("--batch-size", type=click.IntRange(min=1), default=100, help="Frames per database transaction (default: 100)")
+@click.option("--decode-threads", type=click.IntRange(min=1), default=2, help="Threads decoding images ahead (default: 2)")
+@click.option("--every", type=click.IntRange(min=1), default=1, help="Only process every Nth video frame (default: 1)")
+@click.option("--start", type=click.DateTime(), default=None, help="When a video started (default: from its file time)")
+@click.option("--keep-all", is_flag=True, help="Save every new frame even if no birds are detected")
+@jpeg_quality_option
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint of an interrupted run and start over")
+@model_options
+@profile_option
+def reprocess_cmd(
+    source: Path | None,
+    min_confidence: float,
+    workers: int | None,
+    tiling: str,
+    overlap: int,
+    batch_size: int,
+    decode_threads: int,
+    every: int,
+    start,
+    keep_all: bool,
+    jpeg_quality: int,
+    restart: bool,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+    profile: bool,
+) -> None:
+    """Re-run detection over the archive, or import a video or directory of images.
+
+    Without SOURCE, every archived photograph is re-detected and its
+    detections replaced; use the tiling options it was captured with.
+    Frames from a video or another directory are saved as new captures.
+    Interrupted runs continue from their checkpoint.
+    """
+    from loguru import logger
+
+    from pisky.database import Database
+    from pisky.engine import InferenceEngine
+    from pisky.reprocess import (
+        Checkpoint,
+        Reprocessor,
+        archive_items,
+        directory_items,
+        load_image,
+        prefetch,
+        read_ahead,
+        video_items,
+    )
+    from pisky.writer import ImageWriter
+
+    images_dir = get_images_dir()
+    images_dir.mkdir(parents=True, exist_ok=True)
+    archive = source is None or (source.is_dir() and source.resolve() == images_dir.resolve())
+    source_key = "archive" if archive else str(source.resolve())
+    checkpoint = Checkpoint(get_data_dir() / "reprocess-checkpoint.json", source_key)
+    if restart:
+        checkpoint.clear()
+    if checkpoint.position is not None:
+        click.echo(f"Resuming after {checkpoint.position}")
+
+    with Database() as db, InferenceEngine(workers, model, num_threads, xnnpack) as engine, ImageWriter(quality=jpeg_quality) as writer:
+        if archive:
+            items = prefetch(archive_items(db, images_dir, checkpoint.position or 0), load_image, decode_threads)
+        elif source.is_dir():
+            items = prefetch(directory_items(source, checkpoint.position), load_image, decode_threads)
+        else:
+            items = read_ahead(video_items(source, start, checkpoint.position, every))
+
+        reprocessor = Reprocessor(
+            engine,
+            make_tiler(tiling, overlap),
+            db,
+            writer,
+            images_dir,
+            checkpoint,
+            min_confidence=min_confidence,
+            keep_all=keep_all,
+            batch_size=batch_size,
+        )
+        try:
+            stats = reprocessor.run(items)
+        except KeyboardInterrupt:
+            logger.info(f"Interrupted; run again to continue after {checkpoint.position}")
+            return
+        finally:
+            items.close()
+
+    checkpoint.clear()
+    click.echo(
+        f"Reprocessed {stats.frames} frame(s) in {stats.seconds:.1f}s: {stats.detections} detection(s), "
+        f"{stats.updated} photograph(s) updated, {stats.added} added, "
+        f"{stats.skipped} skipped, {stats.unreadable} unreadable"
+    )
+    if profile:
+        click.echo(metrics.summary())
+
+
+@cli.command("gc")
+@click.option(
+    "--keep-all-days",
+    type=click.FloatRange(min=0),
+    default=7.0,
+    help="Prune --keep-all captures without birds after this many days; 0 turns it off (default: 7)",
+)
+@click.option(
+    "--downscale",
+    "downscale_width",
+    type=click.IntRange(min=16),
+    default=None,
+    help="Shrink pruned captures to this width instead of deleting them",
+)
+@click.option(
+    "--archive-days",
+    type=click.FloatRange(min=0),
+    default=30.0,
+    help="Pack images older than this into one archive file per day; 0 turns it off (default: 30)",
+)
+@click.option("--max-age-days", type=click.FloatRange(min=0, min_open=True), default=None, help="Delete days older than this")
+@click.option(
+    "--max-size",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Delete the oldest days while images and archives take more than this many GB",
+)
+@click.option("--batch-size", type=click.IntRange(min=1), default=200, help="Photographs per database transaction (default: 200)")
+@click.option("--dry-run", is_flag=True, help="Report what would be done without changing anything")
+@click.option(
+    "--every",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Keep running, collecting every this many hours",
+)
+def gc_cmd(
+    keep_all_days: float,
+    downscale_width: int | None,
+    archive_days: float,
+    max_age_days: float | None,
+    max_size: float | None,
+    batch_size: int,
+    dry_run: bool,
+    every: float | None,
+) -> None:
+    """Enforce image retention: prune, archive and delete old captures.
+
+    Runs in small batches at low priority, so it can run alongside `pisky watch`.
+    """
+    import os
+    import time
+
+    from loguru import logger
+
+    from pisky.database import Database
+    from pisky.retention import GarbageCollector, RetentionPolicy
+
+    policy = RetentionPolicy(
+        keep_all_days=keep_all_days or None,
+        downscale_width=downscale_width,
+        archive_days=archive_days or None,
+        max_age_days=max_age_days,
+        max_bytes=int(max_size * 1e9) if max_size is not None else None,
+    )
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+    while True:
+        with Database() as db:
+            stats = GarbageCollector(db, policy, batch_size=batch_size, dry_run=dry_run).run()
+        click.echo(f"{'Would have: ' if dry_run else ''}{stats.summary()}")
+        if every is None:
+            return
+        try:
+            time.sleep(every * 3600)
+        except KeyboardInterrupt:
+            logger.info("Interrupted")
+            return
 
 
 @cli.command("serve")
 @click.option("--host", default="0.0.0.0", help="Host to bind to (default: 0.0.0.0)")
 @click.option("--port", default=8000, type=int, help="Port to bind to (default: 8000)")
-def serve_cmd(host: str, port: int) -> None:
-    """Start the API server."""
+@click.option("--camera", "camera_index", type=int, default=0, help="Camera index for captures (default: 0)")
+@click.option("--watch", is_flag=True, help="Also run the watch loop in the server, sharing its camera with the live preview")
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5.0,
+    help="Seconds between captures with --watch (default: 5)",
+)
+@keep_all_option
+@schedule_options
+@dark_option
+@dedupe_options
+@workers_option
+@motion_options
+@tiling_options
+@jpeg_quality_option
+@model_options
+def serve_cmd(
+    host: str,
+    port: int,
+    camera_index: int,
+    watch: bool,
+    interval: float,
+    keep_all: bool,
+    adaptive: bool,
+    burst_interval: float,
+    burst_minutes: float,
+    max_interval: float,
+    dark_threshold: float,
+    dedupe: bool,
+    dedupe_distance: int,
+    visit_gap: float | None,
+    workers: int | None,
+    motion: bool,
+    motion_threshold: float,
+    tiling: str,
+    overlap: int,
+    jpeg_quality: int,
+    model: str | None,
+    num_threads: int | None,
+    xnnpack: bool | None,
+) -> None:
+    """Start the API server.
+
+    With --watch, captures are set up as for `pisky watch`; --keep-all and the
+    motion gate only apply to the watch loop's captures.
+    """
     from pisky.server import run_server
 
     click.echo(f"Starting server at http://{host}:{port}")
-    run_server(host=host, port=port)
+    run_server(
+        host=host,
+        port=port,
+        camera_index=camera_index,
+        watch_interval=interval if watch else None,
+        keep_all=keep_all,
+        model=model,
+        schedule=make_schedule(adaptive, interval, burst_interval, burst_minutes, max_interval) if watch else None,
+        dark_threshold=dark_threshold or None,
+        visits=make_visits(dedupe, dedupe_distance, visit_gap, interval if watch else None),
+        workers=workers,
+        motion_threshold=motion_threshold if watch and motion else None,
+        tiling=tiling,
+        overlap=overlap,
+        jpeg_quality=jpeg_quality,
+        num_threads=num_threads,
+        xnnpack=xnnpack,
+    )
+
+
+# Modules that must not be loaded just by importing each entry point
+STARTUP_CHECKS = {
+    "pisky.cli": ("cv2", "numpy", "tflite_runtime", "tensorflow", "fastapi", "pisky.backends", "pisky.detector"),
+    "pisky.server": ("cv2", "tflite_runtime", "tensorflow", "pisky.backends", "pisky.detector", "pisky.capture"),
+}
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of everything `import module` loads, in a fresh interpreter."""
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@cli.command("startup")
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Also fail if importing an entry point takes longer than this many seconds",
+)
+def startup_cmd(budget: float | None) -> None:
+    """Check that the CLI and server start without loading the detector stack."""
+    failed = False
+    for module, forbidden in STARTUP_CHECKS.items():
+        times = import_times(module)
+        seconds = times.get(module, 0) / 1e6
+        loaded = [name for name in forbidden if name in times]
+        slow = budget is not None and seconds > budget
+        status = "FAIL" if loaded or slow else "ok"
+        click.echo(f"  {status:4} {module}: {seconds:.2f}s")
+        if loaded:
+            click.echo(f"       loads {', '.join(loaded)}")
+        failed = failed or status == "FAIL"
+    if failed:
+        raise SystemExit(1)
 
 
 def main() -> None:
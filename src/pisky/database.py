@@ -1,36 +1,240 @@
+import json
+import queue
 import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from pisky.metrics import timed
 from pisky.paths import get_database_path
 
+BUSY_TIMEOUT_MS = 5000
+
+# Schema migrations, applied in order; PRAGMA user_version records how many have run
+MIGRATIONS: list[list[str]] = [
+    # 1: initial schema
+    [
+        """
+        CREATE TABLE IF NOT EXISTS photographs (
+            photograph_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            captured_at TEXT NOT NULL,
+            image_path TEXT NOT NULL,
+            keep_all INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS detections (
+            detection_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            photograph_id INTEGER NOT NULL,
+            tile_index INTEGER NOT NULL,
+            confidence REAL NOT NULL,
+            FOREIGN KEY (photograph_id) REFERENCES photographs(photograph_id)
+        )
+        """,
+    ],
+    # 2: indexes, plus detection counts and totals maintained by triggers
+    [
+        "CREATE INDEX IF NOT EXISTS idx_detections_photograph_id ON detections (photograph_id)",
+        "CREATE INDEX IF NOT EXISTS idx_photographs_captured_at ON photographs (captured_at, photograph_id)",
+        "ALTER TABLE photographs ADD COLUMN detection_count INTEGER NOT NULL DEFAULT 0",
+        """
+        UPDATE photographs SET detection_count = (
+            SELECT COUNT(*) FROM detections d WHERE d.photograph_id = photographs.photograph_id
+        )
+        """,
+        """
+        CREATE TABLE stats (
+            stats_id INTEGER PRIMARY KEY CHECK (stats_id = 1),
+            total_photographs INTEGER NOT NULL,
+            total_detections INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT INTO stats (stats_id, total_photographs, total_detections)
+        VALUES (1, (SELECT COUNT(*) FROM photographs), (SELECT COUNT(*) FROM detections))
+        """,
+        """
+        CREATE TRIGGER photographs_after_insert AFTER INSERT ON photographs BEGIN
+            UPDATE stats SET total_photographs = total_photographs + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER photographs_after_delete AFTER DELETE ON photographs BEGIN
+            UPDATE stats SET total_photographs = total_photographs - 1;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_after_insert AFTER INSERT ON detections BEGIN
+            UPDATE photographs SET detection_count = detection_count + 1
+            WHERE photograph_id = NEW.photograph_id;
+            UPDATE stats SET total_detections = total_detections + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_after_delete AFTER DELETE ON detections BEGIN
+            UPDATE photographs SET detection_count = detection_count - 1
+            WHERE photograph_id = OLD.photograph_id;
+            UPDATE stats SET total_detections = total_detections - 1;
+        END
+        """,
+    ],
+    # 3: best confidence per photograph, for filtering listings
+    [
+        "ALTER TABLE photographs ADD COLUMN max_confidence REAL",
+        """
+        UPDATE photographs SET max_confidence = (
+            SELECT MAX(confidence) FROM detections d WHERE d.photograph_id = photographs.photograph_id
+        )
+        """,
+        """
+        CREATE TRIGGER detections_max_confidence_after_insert AFTER INSERT ON detections BEGIN
+            UPDATE photographs SET max_confidence = MAX(COALESCE(max_confidence, 0), NEW.confidence)
+            WHERE photograph_id = NEW.photograph_id;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_max_confidence_after_delete AFTER DELETE ON detections BEGIN
+            UPDATE photographs SET max_confidence = (
+                SELECT MAX(confidence) FROM detections d WHERE d.photograph_id = OLD.photograph_id
+            )
+            WHERE photograph_id = OLD.photograph_id;
+        END
+        """,
+    ],
+    # 4: revision counter bumped by every change, for HTTP cache validation
+    [
+        "ALTER TABLE stats ADD COLUMN revision INTEGER NOT NULL DEFAULT 0",
+        """
+        CREATE TRIGGER photographs_revision_after_insert AFTER INSERT ON photographs BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER photographs_revision_after_update AFTER UPDATE ON photographs BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER photographs_revision_after_delete AFTER DELETE ON photographs BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_revision_after_insert AFTER INSERT ON detections BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_revision_after_update AFTER UPDATE ON detections BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER detections_revision_after_delete AFTER DELETE ON detections BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+    ],
+    # 5: perceptual hashes of frames and tiles, and visits grouping near-identical captures
+    [
+        """
+        CREATE TABLE visits (
+            visit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            ended_at TEXT NOT NULL,
+            frame_count INTEGER NOT NULL DEFAULT 1,
+            best_photograph_id INTEGER REFERENCES photographs(photograph_id),
+            best_confidence REAL
+        )
+        """,
+        "CREATE INDEX idx_visits_started_at ON visits (started_at, visit_id)",
+        "ALTER TABLE photographs ADD COLUMN frame_hash INTEGER",
+        "ALTER TABLE photographs ADD COLUMN visit_id INTEGER REFERENCES visits(visit_id)",
+        "ALTER TABLE detections ADD COLUMN tile_hash INTEGER",
+        "CREATE INDEX idx_photographs_visit_id ON photographs (visit_id)",
+        """
+        CREATE TRIGGER visits_revision_after_insert AFTER INSERT ON visits BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER visits_revision_after_update AFTER UPDATE ON visits BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER visits_revision_after_delete AFTER DELETE ON visits BEGIN
+            UPDATE stats SET revision = revision + 1;
+        END
+        """,
+    ],
+    # 6: where a photograph's images are kept: 'file', 'downscaled' (tiles dropped) or 'archived'
+    [
+        "ALTER TABLE photographs ADD COLUMN storage TEXT NOT NULL DEFAULT 'file'",
+    ],
+    # 7: the tile grid (TilePlan JSON) tiles are cut from on request; NULL for captures with tile files
+    [
+        "ALTER TABLE photographs ADD COLUMN tile_plan TEXT",
+    ],
+    # 8: hashes of a visit's latest capture (saved or not), which the next capture is compared against
+    [
+        "ALTER TABLE visits ADD COLUMN frame_hash INTEGER",
+        "ALTER TABLE visits ADD COLUMN tile_hashes TEXT",
+    ],
+]
+
+
+def _dump_tile_hashes(tile_hashes: dict[int, int] | None) -> str | None:
+    return json.dumps(tile_hashes) if tile_hashes is not None else None
+
 
 class Database:
-    def __init__(self, db_path: Path | None = None) -> None:
+    def __init__(self, db_path: Path | None = None, readonly: bool = False) -> None:
         self.db_path = db_path if db_path is not None else get_database_path()
+        self.readonly = readonly
         self.conn: sqlite3.Connection | None = None
 
     def open(self) -> None:
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS photographs (
-                photograph_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                captured_at TEXT NOT NULL,
-                image_path TEXT NOT NULL,
-                keep_all INTEGER NOT NULL DEFAULT 0
+        if self.readonly:
+            # Read-only connections skip schema setup and may be handed between threads
+            self.conn = sqlite3.connect(
+                # as_uri() percent-encodes characters such as ? and # that would end the path
+                self.db_path.resolve().as_uri() + "?mode=ro",
+                uri=True,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,
             )
-        """)
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS detections (
-                detection_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                photograph_id INTEGER NOT NULL,
-                tile_index INTEGER NOT NULL,
-                confidence REAL NOT NULL,
-                FOREIGN KEY (photograph_id) REFERENCES photographs(photograph_id)
-            )
-        """)
-        self.conn.commit()
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA query_only=1")
+            return
+
+        self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets the capture loop write while the API server reads; NORMAL only
+        # fsyncs at checkpoints, which is still crash-safe in WAL mode
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Bring the schema up to date, one migration per transaction."""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, len(MIGRATIONS) + 1):
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if self.conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                    self.conn.rollback()
+                    continue
+                for statement in MIGRATIONS[target - 1]:
+                    self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {target}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
 
     def close(self) -> None:
         if self.conn is not None:
@@ -68,25 +272,285 @@ class Database:
         )
         self.conn.commit()
 
+    def log_capture(
+        self,
+        timestamp: datetime,
+        image_path: str,
+        keep_all: bool,
+        detections: list[tuple[int, float]],
+        frame_hash: int | None = None,
+        tile_hashes: dict[int, int] | None = None,
+        tile_plan: str | None = None,
+    ) -> int:
+        """Log a photograph and its (tile_index, confidence) detections in one transaction."""
+        hashes = [(frame_hash, tile_hashes or {})] if frame_hash is not None else None
+        return self.log_captures([(timestamp, image_path, keep_all, detections)], hashes, [tile_plan])[0]
+
+    def log_captures(
+        self,
+        captures: list[tuple[datetime, str, bool, list[tuple[int, float]]]],
+        hashes: list[tuple[int, dict[int, int]]] | None = None,
+        tile_plans: list[str | None] | None = None,
+    ) -> list[int]:
+        """Log several (timestamp, image_path, keep_all, detections) captures in one transaction.
+
+        `hashes` optionally gives each capture's (frame_hash, {tile_index: tile_hash}),
+        and `tile_plans` the grid its tiles are cut from.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        if hashes is None:
+            hashes = [(None, {})] * len(captures)
+        if tile_plans is None:
+            tile_plans = [None] * len(captures)
+        photograph_ids = []
+        with timed("db_commit"), self.conn:
+            for capture, (frame_hash, tile_hashes), tile_plan in zip(captures, hashes, tile_plans):
+                timestamp, image_path, keep_all, detections = capture
+                cursor = self.conn.execute(
+                    """
+                    INSERT INTO photographs (captured_at, image_path, keep_all, frame_hash, tile_plan)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (timestamp.isoformat(), image_path, int(keep_all), frame_hash, tile_plan),
+                )
+                photograph_id = cursor.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO detections (photograph_id, tile_index, confidence, tile_hash) VALUES (?, ?, ?, ?)",
+                    [
+                        (photograph_id, tile_index, confidence, tile_hashes.get(tile_index))
+                        for tile_index, confidence in detections
+                    ],
+                )
+                photograph_ids.append(photograph_id)
+        return photograph_ids
+
+    def start_visit(
+        self,
+        photograph_id: int,
+        started_at: datetime,
+        confidence: float,
+        frame_hash: int | None = None,
+        tile_hashes: dict[int, int] | None = None,
+    ) -> int:
+        """Start a visit whose first and best frame is photograph_id. Returns its ID."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        with timed("db_commit"), self.conn:
+            cursor = self.conn.execute(
+                """
+                INSERT INTO visits (started_at, ended_at, best_photograph_id, best_confidence, frame_hash, tile_hashes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    started_at.isoformat(),
+                    started_at.isoformat(),
+                    photograph_id,
+                    confidence,
+                    frame_hash,
+                    _dump_tile_hashes(tile_hashes),
+                ),
+            )
+            visit_id = cursor.lastrowid
+            self.conn.execute("UPDATE photographs SET visit_id = ? WHERE photograph_id = ?", (visit_id, photograph_id))
+        return visit_id
+
+    def extend_visit(
+        self,
+        visit_id: int,
+        ended_at: datetime,
+        photograph_id: int | None = None,
+        confidence: float | None = None,
+        frame_hash: int | None = None,
+        tile_hashes: dict[int, int] | None = None,
+    ) -> None:
+        """Count another capture towards a visit, optionally as its new best frame.
+
+        `frame_hash` and `tile_hashes` are the capture's, which the visit's next capture is compared against.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        with timed("db_commit"), self.conn:
+            self.conn.execute(
+                """
+                UPDATE visits SET ended_at = ?, frame_count = frame_count + 1,
+                    frame_hash = COALESCE(?, frame_hash), tile_hashes = COALESCE(?, tile_hashes)
+                WHERE visit_id = ?
+                """,
+                (ended_at.isoformat(), frame_hash, _dump_tile_hashes(tile_hashes), visit_id),
+            )
+            if photograph_id is not None:
+                self.conn.execute(
+                    "UPDATE visits SET best_photograph_id = ?, best_confidence = ? WHERE visit_id = ?",
+                    (photograph_id, confidence, visit_id),
+                )
+                self.conn.execute(
+                    "UPDATE photographs SET visit_id = ? WHERE photograph_id = ?",
+                    (visit_id, photograph_id),
+                )
+
+    def get_last_visit(self) -> dict | None:
+        """Get the most recent visit with its latest capture's hashes, e.g. to continue it after a restart."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        row = self.conn.execute("""
+            SELECT v.visit_id, v.ended_at, v.best_confidence, v.best_photograph_id,
+                   COALESCE(v.frame_hash, p.frame_hash) AS frame_hash, v.tile_hashes
+            FROM visits v LEFT JOIN photographs p ON p.photograph_id = v.best_photograph_id
+            ORDER BY v.started_at DESC, v.visit_id DESC
+            LIMIT 1
+        """).fetchone()
+        if row is None:
+            return None
+        visit = dict(row)
+        if visit["tile_hashes"] is not None:
+            visit["tile_hashes"] = {int(i): h for i, h in json.loads(visit["tile_hashes"]).items()}
+            return visit
+        # Visits from before the latest capture's hashes were kept fall back to their best frame's
+        cursor = self.conn.execute(
+            "SELECT tile_index, tile_hash FROM detections WHERE photograph_id = ? AND tile_hash IS NOT NULL",
+            (visit["best_photograph_id"],),
+        )
+        visit["tile_hashes"] = {r["tile_index"]: r["tile_hash"] for r in cursor.fetchall()}
+        return visit
+
+    def list_visits(self, limit: int = 50, before: tuple[str, int] | None = None) -> list[dict]:
+        """Get a page of visits, newest first, with their best photograph.
+
+        `before` is the (started_at, visit_id) of the last row of the previous page.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        where = "WHERE (v.started_at, v.visit_id) < (?, ?)" if before is not None else ""
+        cursor = self.conn.execute(f"""
+            SELECT v.visit_id, v.started_at, v.ended_at, v.frame_count, v.best_confidence,
+                   v.best_photograph_id, p.image_path
+            FROM visits v LEFT JOIN photographs p ON p.photograph_id = v.best_photograph_id
+            {where}
+            ORDER BY v.started_at DESC, v.visit_id DESC
+            LIMIT ?
+        """, (*(before or ()), limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def replace_detections(
+        self, results: list[tuple[int, list[tuple[int, float]], str | None, dict[int, int]]]
+    ) -> None:
+        """Replace the detections of several photographs in one transaction.
+
+        Each result is (photograph_id, detections, tile_plan, tile_hashes), where
+        tile_plan is the grid the detections' tile indices refer to and
+        tile_hashes the {tile_index: tile_hash} of their tiles. Visits the
+        photographs belong to get their best frame picked again.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        with timed("db_commit"), self.conn:
+            self.conn.executemany(
+                "DELETE FROM detections WHERE photograph_id = ?",
+                [(photograph_id,) for photograph_id, _, _, _ in results],
+            )
+            self.conn.executemany(
+                "INSERT INTO detections (photograph_id, tile_index, confidence, tile_hash) VALUES (?, ?, ?, ?)",
+                [
+                    (photograph_id, tile_index, confidence, tile_hashes.get(tile_index))
+                    for photograph_id, detections, _, tile_hashes in results
+                    for tile_index, confidence in detections
+                ],
+            )
+            self.conn.executemany(
+                "UPDATE photographs SET tile_plan = ? WHERE photograph_id = ?",
+                [(tile_plan, photograph_id) for photograph_id, _, tile_plan, _ in results],
+            )
+            for visit_id in self._get_visit_ids([photograph_id for photograph_id, _, _, _ in results]):
+                self._refresh_visit_best(visit_id)
+
+    def _get_visit_ids(self, photograph_ids: list[int]) -> set[int]:
+        visit_ids = set()
+        for photograph_id in photograph_ids:
+            row = self.conn.execute(
+                "SELECT visit_id FROM photographs WHERE photograph_id = ?", (photograph_id,)
+            ).fetchone()
+            if row is not None and row[0] is not None:
+                visit_ids.add(row[0])
+        return visit_ids
+
+    def _refresh_visit_best(self, visit_id: int) -> None:
+        """Point a visit at its most confident remaining photograph, deleting it if none are left."""
+        best = self.conn.execute(
+            """
+            SELECT photograph_id, max_confidence FROM photographs WHERE visit_id = ?
+            ORDER BY max_confidence DESC, photograph_id LIMIT 1
+            """,
+            (visit_id,),
+        ).fetchone()
+        if best is None:
+            self.conn.execute("DELETE FROM visits WHERE visit_id = ?", (visit_id,))
+            return
+        self.conn.execute(
+            """
+            UPDATE visits SET best_photograph_id = ?, best_confidence = ?
+            WHERE visit_id = ? AND (best_photograph_id IS NOT ? OR best_confidence IS NOT ?)
+            """,
+            (best[0], best[1], visit_id, best[0], best[1]),
+        )
+
     def get_recent_photographs(self, limit: int = 50) -> list[dict]:
         """Get recent photographs with detection counts."""
         if self.conn is None:
             raise RuntimeError("Database not open")
         cursor = self.conn.execute("""
-            SELECT
-                p.photograph_id,
-                p.captured_at,
-                p.image_path,
-                p.keep_all,
-                COUNT(d.detection_id) as detection_count
-            FROM photographs p
-            LEFT JOIN detections d ON p.photograph_id = d.photograph_id
-            GROUP BY p.photograph_id
-            ORDER BY p.captured_at DESC
+            SELECT photograph_id, captured_at, image_path, keep_all, detection_count
+            FROM photographs
+            ORDER BY captured_at DESC, photograph_id DESC
             LIMIT ?
         """, (limit,))
         return [dict(row) for row in cursor.fetchall()]
 
+    def list_photographs(
+        self,
+        limit: int = 50,
+        before: tuple[str, int] | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        min_confidence: float | None = None,
+        has_detections: bool | None = None,
+    ) -> list[dict]:
+        """Get a page of photographs, newest first.
+
+        `before` is the (captured_at, photograph_id) of the last row of the
+        previous page; seeking past it on the index keeps deep pages as cheap
+        as the first. `start` is inclusive and `end` exclusive.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+
+        conditions = []
+        params: list = []
+        if before is not None:
+            conditions.append("(captured_at, photograph_id) < (?, ?)")
+            params.extend(before)
+        if start is not None:
+            conditions.append("captured_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("captured_at < ?")
+            params.append(end)
+        if min_confidence is not None:
+            conditions.append("max_confidence >= ?")
+            params.append(min_confidence)
+        if has_detections is not None:
+            conditions.append("detection_count > 0" if has_detections else "detection_count = 0")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cursor = self.conn.execute(f"""
+            SELECT photograph_id, captured_at, image_path, keep_all, detection_count, max_confidence
+            FROM photographs
+            {where}
+            ORDER BY captured_at DESC, photograph_id DESC
+            LIMIT ?
+        """, (*params, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
     def get_photograph(self, photograph_id: int) -> dict | None:
         """Get a photograph with its detections."""
         if self.conn is None:
@@ -107,18 +571,128 @@ class Database:
         photo["detections"] = [dict(r) for r in cursor.fetchall()]
         return photo
 
+    def get_latest_photograph_id(self) -> int:
+        """Get the highest photograph_id, or 0 if there are none."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        return self.conn.execute("SELECT COALESCE(MAX(photograph_id), 0) FROM photographs").fetchone()[0]
+
+    def get_photographs_after(self, photograph_id: int, limit: int = 100) -> list[dict]:
+        """Get photographs newer than photograph_id, oldest first, with their detections."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        cursor = self.conn.execute(
+            "SELECT photograph_id FROM photographs WHERE photograph_id > ? ORDER BY photograph_id LIMIT ?",
+            (photograph_id, limit),
+        )
+        return [self.get_photograph(row[0]) for row in cursor.fetchall()]
+
+    def get_image_paths_after(self, photograph_id: int, limit: int = 500) -> list[tuple[int, str]]:
+        """Get (photograph_id, image_path) of photographs after photograph_id, oldest first."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        cursor = self.conn.execute(
+            "SELECT photograph_id, image_path FROM photographs WHERE photograph_id > ? ORDER BY photograph_id LIMIT ?",
+            (photograph_id, limit),
+        )
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def get_photographs_between(
+        self,
+        start: str | None,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int = 200,
+        empty_keep_all: bool = False,
+        storage: tuple[str, ...] | None = None,
+    ) -> list[dict]:
+        """Get a batch of photographs captured in [start, end), oldest first, for retention jobs.
+
+        `after` is the (captured_at, photograph_id) of the last row of the
+        previous batch. `empty_keep_all` limits the batch to keep_all captures
+        without detections, and `storage` to photographs stored those ways.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        conditions = ["captured_at < ?"]
+        params: list = [end]
+        if start is not None:
+            conditions.append("captured_at >= ?")
+            params.append(start)
+        if after is not None:
+            conditions.append("(captured_at, photograph_id) > (?, ?)")
+            params.extend(after)
+        if empty_keep_all:
+            conditions.append("keep_all = 1 AND detection_count = 0")
+        if storage is not None:
+            conditions.append(f"storage IN ({', '.join('?' * len(storage))})")
+            params.extend(storage)
+        cursor = self.conn.execute(f"""
+            SELECT photograph_id, captured_at, image_path, storage
+            FROM photographs
+            WHERE {' AND '.join(conditions)}
+            ORDER BY captured_at, photograph_id
+            LIMIT ?
+        """, (*params, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_capture_days(self, end: str | None = None, exclude_storage: str | None = None) -> list[str]:
+        """Get the days (YYYY-MM-DD) with photographs captured before `end`, oldest first."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        conditions, params = [], []
+        if end is not None:
+            conditions.append("captured_at < ?")
+            params.append(end)
+        if exclude_storage is not None:
+            conditions.append("storage != ?")
+            params.append(exclude_storage)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.execute(
+            f"SELECT DISTINCT substr(captured_at, 1, 10) FROM photographs {where} ORDER BY 1",
+            params,
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def set_storage(self, photograph_ids: list[int], storage: str) -> None:
+        """Record where the images of several photographs are now kept."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        with timed("db_commit"), self.conn:
+            self.conn.executemany(
+                "UPDATE photographs SET storage = ? WHERE photograph_id = ?",
+                [(storage, photograph_id) for photograph_id in photograph_ids],
+            )
+
+    def delete_photographs(self, photograph_ids: list[int]) -> None:
+        """Delete photographs and their detections in one transaction, keeping visits consistent.
+
+        A visit that loses its best frame falls back to its best remaining
+        photograph; a visit with none left is deleted.
+        """
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        params = [(photograph_id,) for photograph_id in photograph_ids]
+        with timed("db_commit"), self.conn:
+            visit_ids = self._get_visit_ids(photograph_ids)
+            self.conn.executemany("DELETE FROM detections WHERE photograph_id = ?", params)
+            self.conn.executemany("DELETE FROM photographs WHERE photograph_id = ?", params)
+            for visit_id in visit_ids:
+                self._refresh_visit_best(visit_id)
+
     def get_stats(self) -> dict:
         """Get summary statistics."""
         if self.conn is None:
             raise RuntimeError("Database not open")
 
-        photo_count = self.conn.execute("SELECT COUNT(*) FROM photographs").fetchone()[0]
-        detection_count = self.conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        row = self.conn.execute("SELECT total_photographs, total_detections FROM stats").fetchone()
+        return dict(row)
 
-        return {
-            "total_photographs": photo_count,
-            "total_detections": detection_count,
-        }
+    def get_revision(self) -> int:
+        """Get a counter that changes whenever photographs or detections change."""
+        if self.conn is None:
+            raise RuntimeError("Database not open")
+        return self.conn.execute("SELECT revision FROM stats").fetchone()[0]
 
     def __enter__(self) -> "Database":
         self.open()
@@ -126,3 +700,50 @@ class Database:
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         self.close()
+
+
+class DatabasePool:
+    """A fixed set of long-lived read-only connections, e.g. for API requests.
+
+    The schema is brought up to date once when the pool opens. Each
+    connection keeps SQLite's prepared statement cache warm between uses.
+    """
+
+    def __init__(self, size: int = 4, db_path: Path | None = None) -> None:
+        self.size = size
+        self.db_path = db_path
+        self._pool: queue.LifoQueue[Database] = queue.LifoQueue()
+        self._all: list[Database] = []
+
+    def open(self) -> None:
+        writer = Database(self.db_path)
+        writer.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with writer:
+            pass
+        for _ in range(self.size):
+            db = Database(self.db_path, readonly=True)
+            db.open()
+            self._all.append(db)
+            self._pool.put(db)
+
+    @contextmanager
+    def connection(self) -> Iterator[Database]:
+        """Borrow a connection, waiting if all of them are in use."""
+        db = self._pool.get()
+        try:
+            yield db
+        finally:
+            self._pool.put(db)
+
+    def close(self) -> None:
+        for db in self._all:
+            db.close()
+        self._all = []
+        self._pool = queue.LifoQueue()
+
+    def __enter__(self) -> "DatabasePool":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import cv2
+import numpy as np
+from numpy import ndarray
+
+HASH_MASK = (1 << 64) - 1
+
+
+def dhash(image: ndarray) -> int:
+    """64-bit difference hash: whether each cell of a 9x8 thumbnail is darker than its right neighbour.
+
+    Channels are averaged rather than weighted, so the hash is the same for a
+    BGR image and its RGB conversion. Returned as a signed integer so SQLite
+    can store it.
+    """
+    # Every few pixels is plenty for a 9x8 thumbnail and much cheaper on a full frame
+    step = max(1, min(image.shape[0] // 64, image.shape[1] // 72))
+    small = cv2.resize(image[::step, ::step], (9, 8), interpolation=cv2.INTER_AREA)
+    gray = small.mean(axis=2) if small.ndim == 3 else small
+    bits = np.packbits(gray[:, 1:] > gray[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big", signed=True)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of bits that differ between two hashes."""
+    return bin((a ^ b) & HASH_MASK).count("1")
+
+
+@dataclass
+class Visit:
+    """The capture a bird's visit is compared against: its latest frame and best confidence so far."""
+
+    visit_id: int | None
+    ended_at: datetime
+    frame_hash: int
+    tile_hashes: dict[int, int] = field(default_factory=dict)
+    best_confidence: float = 0.0
+
+
+class VisitTracker:
+    """Groups consecutive near-identical detections into visits.
+
+    A capture belongs to the current visit when it comes within `max_gap`
+    seconds of the visit's last one and its frame and every tile with a bird
+    hash within `max_distance` bits of that capture. Only the first frame of
+    a visit, and later frames that beat its best confidence, need saving.
+    """
+
+    def __init__(self, max_distance: int = 8, max_gap: float = 60.0) -> None:
+        self.max_distance = max_distance
+        self.max_gap = max_gap
+        self.visit: Visit | None = None
+
+    def matches(self, captured_at: datetime, frame_hash: int, tile_hashes: dict[int, int]) -> bool:
+        visit = self.visit
+        if visit is None or (captured_at - visit.ended_at).total_seconds() > self.max_gap:
+            return False
+        if hamming(frame_hash, visit.frame_hash) > self.max_distance:
+            return False
+        return all(
+            i in visit.tile_hashes and hamming(h, visit.tile_hashes[i]) <= self.max_distance
+            for i, h in tile_hashes.items()
+        )
+
+    def observe(self, captured_at: datetime, frame_hash: int, tile_hashes: dict[int, int], confidence: float) -> str:
+        """Record a capture with birds in it.
+
+        Returns "duplicate" (same visit, nothing new to save), "better" (same
+        visit, new best frame) or "new" (a new visit, whose visit_id the caller
+        fills in once it is stored).
+        """
+        if not self.matches(captured_at, frame_hash, tile_hashes):
+            self.visit = Visit(None, captured_at, frame_hash, tile_hashes, confidence)
+            return "new"
+        # Compare the next capture with this one, so a bird that shifts slowly stays one visit
+        visit = self.visit
+        visit.ended_at = captured_at
+        visit.frame_hash = frame_hash
+        visit.tile_hashes = tile_hashes
+        if confidence > visit.best_confidence:
+            visit.best_confidence = confidence
+            return "better"
+        return "duplicate"
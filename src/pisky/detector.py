@@ -1,9 +1,8 @@
-import os
 import warnings
+from collections.abc import Sequence
 from dataclasses import dataclass
 from pathlib import Path
 
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning, module="tensorflow")
 
@@ -11,16 +10,9 @@ import cv2  # noqa: E402
 import numpy as np  # noqa: E402
 from numpy import ndarray  # noqa: E402
 
-# Try tflite-runtime first (lighter, better ARM support), fall back to tensorflow
-try:
-    from tflite_runtime.interpreter import Interpreter  # noqa: E402
-except ImportError:
-    import tensorflow as tf  # noqa: E402
-    Interpreter = tf.lite.Interpreter
-
-from pisky.paths import ensure_model_downloaded  # noqa: E402
-
-BIRD_CLASS_ID = 14
+from pisky.backends import Backend, load_backend  # noqa: E402
+from pisky.models import BIRD_CLASS_ID, ModelSpec, resolve_model  # noqa: E402, F401
+from pisky.metrics import timed  # noqa: E402
 
 
 @dataclass
@@ -30,48 +22,76 @@ class Detection:
 
 
 class BirdDetector:
-    def __init__(self, model_path: Path | None = None) -> None:
-        if model_path is None:
-            model_path = ensure_model_downloaded()
-        self.interpreter = Interpreter(model_path=str(model_path))
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
-
-    def detect(self, image: ndarray, min_confidence: float = 0.33) -> list[Detection]:
-        """Detect birds in a 300x300 BGR image. Returns list of detections."""
-        # Convert BGR (OpenCV) to RGB (model expects RGB)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        input_data = np.expand_dims(image_rgb, axis=0).astype(np.uint8)
-        self.interpreter.set_tensor(self.input_details[0]["index"], input_data)
-
-        # Run inference
-        self.interpreter.invoke()
-
-        # Get outputs
-        boxes = self.interpreter.get_tensor(self.output_details[0]["index"])[0]
-        classes = self.interpreter.get_tensor(self.output_details[1]["index"])[0]
-        scores = self.interpreter.get_tensor(self.output_details[2]["index"])[0]
+    """Finds birds in tiles with whichever backend runs the chosen model.
+
+    Tiles that don't match the model's input size are resized on the way in;
+    boxes come back normalized, so they still map onto the original tile.
+    """
+
+    def __init__(
+        self,
+        model: ModelSpec | str | Path | None = None,
+        num_threads: int | None = None,
+        xnnpack: bool | None = None,
+    ) -> None:
+        self.model = resolve_model(model)
+        self.backend: Backend = load_backend(self.model, num_threads, xnnpack)
+        self.input_size = self.backend.input_size
+        self._batch: ndarray | None = None
+
+    @property
+    def supports_batching(self) -> bool | None:
+        return self.backend.supports_batching
+
+    def _prepare(self, tiles: Sequence[ndarray] | ndarray, rgb: bool) -> Sequence[ndarray] | ndarray:
+        """Tiles as RGB at the model's input size, copied into a reusable (N, H, W, 3) buffer if needed."""
+        n = len(tiles)
+        h, w = self.input_size
+        if rgb and tiles[0].shape[:2] == (h, w):
+            # Backends copy straight from the tiles into their input tensors
+            return tiles
+        if self._batch is None or self._batch.shape[:3] != (n, h, w):
+            self._batch = np.empty((n, h, w, 3), dtype=np.uint8)
+        with timed("color"):
+            for i, tile in enumerate(tiles):
+                if tile.shape[:2] == (h, w):
+                    self._batch[i] = tile
+                else:
+                    cv2.resize(tile, (w, h), dst=self._batch[i], interpolation=cv2.INTER_AREA)
+            if not rgb:
+                rows = self._batch.reshape(n * h, w, 3)
+                cv2.cvtColor(rows, cv2.COLOR_BGR2RGB, dst=rows)
+        return self._batch
+
+    def detect_batch(
+        self,
+        tiles: Sequence[ndarray] | ndarray,
+        min_confidence: float = 0.33,
+        rgb: bool = False,
+    ) -> list[list[Detection]]:
+        """Detect birds in a batch of BGR tiles (RGB if rgb=True). Returns detections per tile."""
+        n = len(tiles)
+        if n == 0:
+            return []
+        boxes, classes, scores = self.backend.infer(self._prepare(tiles, rgb))
 
         # Filter for birds above confidence threshold
-        detections = []
-        for i, (class_id, score) in enumerate(zip(classes, scores)):
-            if int(class_id) == BIRD_CLASS_ID and score >= min_confidence:
-                detections.append(Detection(
-                    confidence=float(score),
-                    bbox=tuple(boxes[i])
-                ))
+        mask = (classes.astype(np.int32) == self.model.bird_class) & (scores >= min_confidence)
+        results = []
+        for i in range(n):
+            keep = mask[i]
+            results.append([
+                Detection(confidence=score, bbox=tuple(box))
+                for score, box in zip(scores[i][keep].tolist(), boxes[i][keep].tolist())
+            ])
+        return results
 
-        return detections
+    def detect(self, image: ndarray, min_confidence: float = 0.33) -> list[Detection]:
+        """Detect birds in a BGR tile. Returns list of detections."""
+        return self.detect_batch([image], min_confidence)[0]
 
     def detect_all(self, image: ndarray, min_confidence: float = 0.5) -> list[tuple[int, float]]:
         """Detect all objects (for debugging). Returns list of (class_id, confidence)."""
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        input_data = np.expand_dims(image_rgb, axis=0).astype(np.uint8)
-        self.interpreter.set_tensor(self.input_details[0]["index"], input_data)
-        self.interpreter.invoke()
-
-        classes = self.interpreter.get_tensor(self.output_details[1]["index"])[0]
-        scores = self.interpreter.get_tensor(self.output_details[2]["index"])[0]
-
-        return [(int(c), float(s)) for c, s in zip(classes, scores) if s >= min_confidence]
+        _, classes, scores = self.backend.infer(self._prepare([image], rgb=False))
+        mask = scores[0] >= min_confidence
+        return list(zip(classes[0][mask].astype(int).tolist(), scores[0][mask].tolist()))
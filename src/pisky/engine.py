@@ -0,0 +1,133 @@
+import os
+import queue
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+from numpy import ndarray
+
+from pisky.models import ModelSpec, resolve_model
+from pisky.detector import BirdDetector, Detection
+from pisky.paths import load_env
+
+
+def default_workers() -> int:
+    """Worker count from PISKY_WORKERS, otherwise one per CPU core."""
+    load_env()
+    env_workers = os.environ.get("PISKY_WORKERS")
+    if env_workers:
+        return max(1, int(env_workers))
+    return os.cpu_count() or 1
+
+
+class InferenceEngine:
+    """Spreads tiles across a pool of interpreters, one per worker thread.
+
+    TFLite releases the GIL while invoking, so threads give real parallelism
+    without copying tiles into worker processes. Each interpreter gets an
+    equal share of the cores for its own intra-op threads unless num_threads
+    says otherwise. load_model() swaps in another model while running.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        model: ModelSpec | str | Path | None = None,
+        num_threads: int | None = None,
+        xnnpack: bool | None = None,
+    ) -> None:
+        self.workers = workers if workers is not None else default_workers()
+        self.num_threads = num_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.xnnpack = xnnpack
+        self.requested_model = model
+        self.detectors: list[BirdDetector] = []
+        self._idle: queue.SimpleQueue[BirdDetector] = queue.SimpleQueue()
+        self.load_model(model)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pisky-infer")
+            if self.workers > 1
+            else None
+        )
+
+    @property
+    def model(self) -> ModelSpec:
+        return self.detectors[0].model
+
+    @property
+    def input_size(self) -> tuple[int, int]:
+        return self.detectors[0].input_size
+
+    def load_model(self, model: ModelSpec | str | Path | None = None) -> ModelSpec:
+        """Load a model into a fresh set of detectors and switch to them.
+
+        Calls already running finish on the old detectors. With no model the
+        one this engine was created with is looked up again, so a changed
+        registry default or a replaced model file is picked up.
+        """
+        if model is None:
+            model = self.requested_model
+        spec = resolve_model(model)
+        detectors = [BirdDetector(spec, self.num_threads, self.xnnpack) for _ in range(self.workers)]
+        idle: queue.SimpleQueue[BirdDetector] = queue.SimpleQueue()
+        for detector in detectors:
+            idle.put(detector)
+        # Swapping the queue is atomic; callers hold on to the queue they took a detector from
+        self.detectors, self._idle = detectors, idle
+        logger.info(
+            f"Loaded model {spec.name} ({spec.backend}, {self.input_size[1]}x{self.input_size[0]} input, "
+            f"{self.workers} worker(s) x {self.num_threads} thread(s))"
+        )
+        return spec
+
+    def _run(self, tiles: Sequence[ndarray] | ndarray, min_confidence: float, rgb: bool) -> list[list[Detection]]:
+        idle = self._idle
+        detector = idle.get()
+        try:
+            return detector.detect_batch(tiles, min_confidence, rgb)
+        finally:
+            idle.put(detector)
+
+    def detect_batch(
+        self,
+        tiles: Sequence[ndarray] | ndarray,
+        min_confidence: float = 0.33,
+        rgb: bool = False,
+    ) -> list[list[Detection]]:
+        """Detect birds in tiles across all workers. Returns detections in tile order."""
+        n = len(tiles)
+        if self._executor is None or n <= 1:
+            return self._run(tiles, min_confidence, rgb)
+
+        # Contiguous chunks keep each worker's batch shape stable from frame to frame
+        chunks = min(self.workers, n)
+        bounds = [n * i // chunks for i in range(chunks + 1)]
+        futures = [
+            self._executor.submit(self._run, tiles[start:end], min_confidence, rgb)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        return [detections for future in futures for detections in future.result()]
+
+    def detect(self, image: ndarray, min_confidence: float = 0.33) -> list[Detection]:
+        """Detect birds in a single BGR tile."""
+        return self._run([image], min_confidence, False)[0]
+
+    def detect_all(self, image: ndarray, min_confidence: float = 0.5) -> list[tuple[int, float]]:
+        """Detect all objects in a single BGR tile (for debugging)."""
+        idle = self._idle
+        detector = idle.get()
+        try:
+            return detector.detect_all(image, min_confidence)
+        finally:
+            idle.put(detector)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "InferenceEngine":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,107 @@
+import asyncio
+
+from loguru import logger
+
+
+class EventBroker:
+    """Fans events out to any number of subscribers.
+
+    Each subscriber gets its own bounded queue. A subscriber that falls
+    behind loses its oldest events rather than holding up everyone else or
+    growing without bound. publish() must run on the event loop's thread.
+    """
+
+    def __init__(self, max_buffer: int = 32) -> None:
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._subscribers: set[asyncio.Queue] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffer)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: dict) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((event, data))
+
+
+class DatabaseWatcher:
+    """Publishes new photographs as they are committed, by this or any other process.
+
+    Polls the database's revision counter, a single-row read, while anyone is
+    subscribed. wake() makes it check immediately, e.g. after an in-process
+    capture.
+    """
+
+    def __init__(self, broker: EventBroker, db_pool, make_event, interval: float = 1.0) -> None:
+        self.broker = broker
+        self.db_pool = db_pool
+        self.make_event = make_event
+        self.interval = interval
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._revision: int | None = None
+        self._last_id = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self.broker.subscriber_count:
+                # Nobody listening: forget our position so we start from "now" next time
+                self._revision = None
+                continue
+            try:
+                events = await asyncio.to_thread(self._poll)
+            except Exception:
+                logger.exception("Could not poll for new photographs")
+                continue
+            for event, data in events:
+                self.broker.publish(event, data)
+
+    def _poll(self) -> list[tuple[str, dict]]:
+        with self.db_pool.connection() as db:
+            revision = db.get_revision()
+            if revision == self._revision:
+                return []
+            if self._revision is None:
+                self._revision = revision
+                self._last_id = db.get_latest_photograph_id()
+                return []
+            self._revision = revision
+
+            events = []
+            for photo in db.get_photographs_after(self._last_id):
+                self._last_id = photo["photograph_id"]
+                events.append(("photograph", self.make_event(photo)))
+            events.append(("stats", db.get_stats()))
+            return events
@@ -0,0 +1,7 @@
+# The default tile grid, in a module of its own so the CLI can use it without loading OpenCV
+
+# Input size of the detection model
+TILE_SIZE = 300
+# Tiles across and down the center crop of a frame
+GRID_COLS = 6
+GRID_ROWS = 3
@@ -0,0 +1,109 @@
+import bisect
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from a fast tile copy to a slow SD card write
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Bucketed durations, plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS, window: int = 2048) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        """The q-quantile (0-1) of the recent samples."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Per-stage timing histograms for the capture pipeline, shared by the whole process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Record how long the body takes under `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def stages(self) -> dict[str, dict]:
+        """count, total, mean, p50 and p99 (seconds) for each stage."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "total": h.sum,
+                    "mean": h.sum / h.count,
+                    "p50": h.quantile(0.5),
+                    "p99": h.quantile(0.99),
+                }
+                for stage, h in sorted(self._histograms.items())
+            }
+
+    def summary(self) -> str:
+        """A table of stage timings in milliseconds."""
+        lines = [f"{'stage':<12} {'count':>7} {'mean':>9} {'p50':>9} {'p99':>9} {'total':>10}"]
+        for stage, s in self.stages().items():
+            lines.append(
+                f"{stage:<12} {s['count']:>7} {s['mean'] * 1e3:>7.2f}ms {s['p50'] * 1e3:>7.2f}ms "
+                f"{s['p99'] * 1e3:>7.2f}ms {s['total']:>9.2f}s"
+            )
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP pisky_stage_seconds Time spent in each stage of the capture pipeline.",
+            "# TYPE pisky_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f'pisky_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'pisky_stage_seconds_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'pisky_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def timed(stage: str):
+    """Context manager timing a stage into the process-wide metrics."""
+    return metrics.time(stage)
@@ -0,0 +1,95 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from pisky.paths import MODEL_FILENAME, ensure_model_downloaded, get_models_dir, load_env
+
+# "bird" in the label map of the default COCO SSD model (0-based, no background class)
+BIRD_CLASS_ID = 14
+DEFAULT_MODEL = "ssd-mobilenet-v1"
+REGISTRY_FILENAME = "models.json"
+BACKENDS = ("tflite", "onnx", "opencv")
+SUFFIX_BACKENDS = {
+    ".tflite": "tflite",
+    ".onnx": "onnx",
+    ".pb": "opencv",
+    ".caffemodel": "opencv",
+    ".weights": "opencv",
+}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """A model file and what is needed to run it."""
+
+    name: str
+    path: Path
+    backend: str
+    bird_class: int = BIRD_CLASS_ID
+    config: Path | None = None  # graph description for OpenCV DNN models
+    input_size: tuple[int, int] | None = None  # (height, width), if the model doesn't say
+    outputs: tuple[int, int, int] | None = None  # indices of the boxes, classes and scores outputs
+
+
+def backend_for(path: Path) -> str:
+    backend = SUFFIX_BACKENDS.get(path.suffix.lower())
+    if backend is None:
+        raise ValueError(f"Can't tell which backend runs {path.name}; add it to {REGISTRY_FILENAME}")
+    return backend
+
+
+def load_registry() -> dict:
+    """The built-in default model plus any models listed in models/models.json.
+
+    The registry looks like:
+        {"default": "efficientdet",
+         "models": {"efficientdet": {"file": "efficientdet_lite0.tflite", "bird_class": 15}}}
+    Each model may also set "backend", "config", "input_size" and "outputs".
+    """
+    registry = {
+        "default": DEFAULT_MODEL,
+        "models": {DEFAULT_MODEL: {"file": MODEL_FILENAME, "backend": "tflite", "bird_class": BIRD_CLASS_ID}},
+    }
+    registry_path = get_models_dir() / REGISTRY_FILENAME
+    if registry_path.exists():
+        local = json.loads(registry_path.read_text())
+        registry["models"].update(local.get("models", {}))
+        registry["default"] = local.get("default", registry["default"])
+    return registry
+
+
+def model_spec(name: str, entry: dict) -> ModelSpec:
+    models_dir = get_models_dir()
+    path = models_dir / entry["file"]
+    return ModelSpec(
+        name=name,
+        path=path,
+        backend=entry.get("backend") or backend_for(path),
+        bird_class=entry.get("bird_class", BIRD_CLASS_ID),
+        config=models_dir / entry["config"] if entry.get("config") else None,
+        input_size=tuple(entry["input_size"]) if entry.get("input_size") else None,
+        outputs=tuple(entry["outputs"]) if entry.get("outputs") else None,
+    )
+
+
+def resolve_model(model: "ModelSpec | str | Path | None" = None) -> ModelSpec:
+    """Look up a model by registry name or file path; None means PISKY_MODEL or the registry default."""
+    if isinstance(model, ModelSpec):
+        return model
+    registry = load_registry()
+    if model is None:
+        load_env()
+        model = os.environ.get("PISKY_MODEL") or registry["default"]
+
+    entry = registry["models"].get(str(model))
+    if entry is not None:
+        spec = model_spec(str(model), entry)
+        if spec.name == DEFAULT_MODEL and not spec.path.exists():
+            ensure_model_downloaded()
+        return spec
+
+    path = Path(model)
+    if not path.is_file():
+        raise ValueError(f"Unknown model {str(model)!r}: not in {REGISTRY_FILENAME} and not a file")
+    return ModelSpec(name=path.stem, path=path.resolve(), backend=backend_for(path))
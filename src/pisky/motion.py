@@ -0,0 +1,87 @@
+from collections.abc import Sequence
+
+import cv2
+import numpy as np
+from numpy import ndarray
+
+# Tiles are compared at 1/10 scale: 30x30 for the default 300px tiles
+DOWNSCALE = 10
+# BT.601 luma weights, in OpenCV's BGR channel order
+LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299])
+
+
+def mean_luminance(image: ndarray, step: int = 8) -> float:
+    """Average brightness (0-255) of a BGR image, sampled from every `step`-th pixel."""
+    return float(image[::step, ::step].mean(axis=(0, 1)) @ LUMA_WEIGHTS)
+
+
+class MotionGate:
+    """Selects tiles that differ from a running background model.
+
+    Each tile is reduced to a small grayscale image and compared against an
+    exponential moving average of previous frames. A tile passes the gate when
+    enough of its pixels changed by more than `pixel_threshold` gray levels.
+    Every `refresh_every` frames all tiles pass, so slow scene changes and
+    birds that stopped moving still get looked at.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.01,
+        pixel_threshold: int = 25,
+        alpha: float = 0.1,
+        refresh_every: int = 60,
+    ) -> None:
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.alpha = alpha
+        self.refresh_every = refresh_every
+        self.background: ndarray | None = None
+        self.frames = 0
+        self.frames_skipped = 0
+        self.tiles_seen = 0
+        self.tiles_skipped = 0
+
+    def _downscale(self, tiles: Sequence[ndarray] | ndarray) -> ndarray:
+        h, w = tiles[0].shape[:2]
+        size = (max(1, w // DOWNSCALE), max(1, h // DOWNSCALE))
+        small = np.empty((len(tiles), size[1], size[0]), dtype=np.float32)
+        for i, tile in enumerate(tiles):
+            small[i] = cv2.cvtColor(cv2.resize(tile, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return small
+
+    def select(self, tiles: Sequence[ndarray] | ndarray) -> list[int]:
+        """Update the background and return indices of tiles that changed."""
+        n = len(tiles)
+        if n == 0:
+            return []
+        small = self._downscale(tiles)
+        self.frames += 1
+        self.tiles_seen += n
+
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small
+            return list(range(n))
+
+        changed_fraction = (np.abs(small - self.background) > self.pixel_threshold).mean(axis=(1, 2))
+        self.background += self.alpha * (small - self.background)
+
+        if self.refresh_every and self.frames % self.refresh_every == 0:
+            return list(range(n))
+
+        selected = np.flatnonzero(changed_fraction >= self.threshold).tolist()
+        self.tiles_skipped += n - len(selected)
+        if not selected:
+            self.frames_skipped += 1
+        return selected
+
+    def reset(self) -> None:
+        self.background = None
+
+    def summary(self) -> str:
+        """One-line description of gating decisions so far."""
+        skipped = self.tiles_skipped / self.tiles_seen if self.tiles_seen else 0.0
+        return (
+            f"{self.frames} frame(s), {self.frames_skipped} fully skipped, "
+            f"{self.tiles_skipped}/{self.tiles_seen} tiles skipped ({skipped:.0%})"
+        )
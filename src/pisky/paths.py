@@ -1,34 +1,45 @@
 import io
 import os
 import zipfile
+from functools import cache
 from pathlib import Path
-from urllib.request import urlopen
 
-from dotenv import load_dotenv
 from loguru import logger
 
-load_dotenv()
-
 # Model source - SSD MobileNet V1 quantized, trained on COCO
 MODEL_URL = "https://storage.googleapis.com/download.tensorflow.org/models/tflite/coco_ssd_mobilenet_v1_1.0_quant_2018_06_29.zip"
 MODEL_FILENAME = "detect.tflite"
 
 
+@cache
+def load_env() -> None:
+    """Load settings from a .env file into the environment, once."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
 def get_data_dir() -> Path:
     """Get the data directory for models, images, and database.
 
     Uses PISKY_DATA_DIR environment variable if set,
     otherwise defaults to ~/.pisky.
     """
+    load_env()
     env_dir = os.environ.get("PISKY_DATA_DIR")
     if env_dir:
         return Path(env_dir)
     return Path("/home") / "john" / ".pisky"
 
 
+def get_models_dir() -> Path:
+    """Get path to the directory of model files and their registry."""
+    return get_data_dir() / "models"
+
+
 def get_model_path() -> Path:
-    """Get path to the TFLite model file."""
-    return get_data_dir() / "models" / MODEL_FILENAME
+    """Get path to the default TFLite model file."""
+    return get_models_dir() / MODEL_FILENAME
 
 
 def ensure_model_downloaded() -> Path:
@@ -38,6 +49,8 @@ def ensure_model_downloaded() -> Path:
     if model_path.exists():
         return model_path
 
+    from urllib.request import urlopen
+
     logger.info(f"Model not found at {model_path}")
     logger.info(f"Downloading from {MODEL_URL}")
 
@@ -61,6 +74,16 @@ def get_images_dir() -> Path:
     return get_data_dir() / "images"
 
 
+def get_archive_dir() -> Path:
+    """Get path to the per-day archives of old images."""
+    return get_data_dir() / "archive"
+
+
 def get_database_path() -> Path:
     """Get path to the SQLite database."""
     return get_data_dir() / "detections.db"
+
+
+def get_cache_dir() -> Path:
+    """Get path to the cache of derived images (thumbnails)."""
+    return get_data_dir() / "cache"
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+    from pisky.tiling import FrameDetection, TilePlan
+
+GRID_COLOR = (255, 255, 255)
+DETECTION_COLOR = (0, 200, 255)
+
+
+class FrameHub:
+    """Shares the capture loop's latest frame with any number of preview viewers.
+
+    The capture thread only swaps a reference in publish() and wakes the
+    viewers, which wait on the event loop without holding a thread each.
+    JPEG encoding runs on one executor thread per frame and overlay setting,
+    and the result is shared by every viewer, so each frame is encoded at
+    most once per overlay setting.
+    """
+
+    def __init__(self, quality: int = 70) -> None:
+        self.quality = quality
+        self.viewers = 0
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+        self._seq = 0
+        self._frame: "ndarray | None" = None
+        self._plan: "TilePlan | None" = None
+        self._detections: "list[FrameDetection]" = []
+        self._encoded: dict[bool, tuple[int, bytes]] = {}
+        # Viewers waiting for a new frame, and encodes in progress; only touched on their event loop
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._encoding: dict[bool, tuple[int, asyncio.Future]] = {}
+
+    def add_viewer(self) -> None:
+        with self._cond:
+            self.viewers += 1
+
+    def remove_viewer(self) -> None:
+        with self._cond:
+            self.viewers -= 1
+
+    def publish(
+        self,
+        frame: "ndarray",
+        plan: "TilePlan | None" = None,
+        detections: "list[FrameDetection] | None" = None,
+    ) -> None:
+        """Make a BGR frame (which the hub now owns) the latest one."""
+        with self._cond:
+            self._frame = frame
+            self._plan = plan
+            if detections is not None:
+                self._detections = detections
+            self._seq += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The viewer's loop has closed
+
+    async def next_jpeg(self, after_seq: int, overlay: bool = False, timeout: float = 1.0) -> tuple[int, bytes] | None:
+        """Wait for a frame newer than after_seq. Returns (seq, jpeg), or None on timeout."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            seq = self._seq
+            if seq <= after_seq:
+                self._waiters.add(waiter)
+        if seq <= after_seq:
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                with self._cond:
+                    self._waiters.discard(waiter)
+            with self._cond:
+                seq = self._seq
+
+        cached = self._encoded.get(overlay)
+        if cached is not None and cached[0] >= seq:
+            return cached
+        encoding = self._encoding.get(overlay)
+        if encoding is None or encoding[0] < seq:
+            encoding = (seq, asyncio.ensure_future(asyncio.to_thread(self._encode, overlay)))
+            self._encoding[overlay] = encoding
+        # Shielded, so a viewer disconnecting doesn't cancel the encode the others wait for
+        return await asyncio.shield(encoding[1])
+
+    def _encode(self, overlay: bool) -> tuple[int, bytes] | None:
+        with self._cond:
+            seq, frame, plan, detections = self._seq, self._frame, self._plan, self._detections
+
+        import cv2
+
+        with self._encode_lock:
+            cached = self._encoded.get(overlay)
+            if cached is not None and cached[0] >= seq:
+                return cached
+            if overlay:
+                frame = draw_overlay(frame.copy(), plan, detections)
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                return None
+            self._encoded[overlay] = (seq, encoded.tobytes())
+            return self._encoded[overlay]
+
+
+def draw_overlay(image: "ndarray", plan: "TilePlan | None", detections: "list[FrameDetection]") -> "ndarray":
+    """Draw the tile grid and detection boxes onto a BGR image in place."""
+    import cv2
+
+    if plan is not None:
+        t = plan.tile_size
+        for x, y in plan.origins().tolist():
+            cv2.rectangle(image, (x, y), (x + t - 1, y + t - 1), GRID_COLOR, 1)
+    for det in detections:
+        ymin, xmin, ymax, xmax = (int(round(v)) for v in det.bbox)
+        cv2.rectangle(image, (xmin, ymin), (xmax, ymax), DETECTION_COLOR, 2)
+        cv2.putText(
+            image,
+            f"{det.confidence:.2f}",
+            (xmin, max(ymin - 6, 12)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            DETECTION_COLOR,
+            1,
+            cv2.LINE_AA,
+        )
+    return image
@@ -0,0 +1,285 @@
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TypeVar
+
+import cv2
+import numpy as np
+from loguru import logger
+from numpy import ndarray
+
+from pisky.archive import read_image_bytes
+from pisky.database import Database
+from pisky.dedupe import dhash
+from pisky.engine import InferenceEngine
+from pisky.tiling import Tiler, merge_detections
+from pisky.writer import ImageWriter
+
+T = TypeVar("T")
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+@dataclass
+class Item:
+    """One frame to reprocess, either an archived photograph or a new capture."""
+
+    position: int | str  # checkpoint position, increasing through the source
+    name: str
+    photograph_id: int | None = None
+    captured_at: datetime | None = None
+    path: Path | None = None
+    image: ndarray | None = None
+
+
+class Checkpoint:
+    """The last committed position of a reprocessing run, so it can be resumed."""
+
+    def __init__(self, path: Path, source: str) -> None:
+        self.path = path
+        self.source = source
+        self.position: int | str | None = None
+        if path.exists():
+            state = json.loads(path.read_text())
+            if state.get("source") == source:
+                self.position = state["position"]
+
+    def save(self, position: int | str) -> None:
+        self.position = position
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps({"source": self.source, "position": position}))
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.position = None
+        self.path.unlink(missing_ok=True)
+
+
+def archive_items(db: Database, images_dir: Path, after_id: int = 0, page: int = 500) -> Iterator[Item]:
+    """Photographs already in the database, oldest first."""
+    while True:
+        rows = db.get_image_paths_after(after_id, page)
+        if not rows:
+            return
+        for photograph_id, image_path in rows:
+            yield Item(photograph_id, image_path, photograph_id=photograph_id, path=images_dir / image_path)
+        after_id = rows[-1][0]
+
+
+def directory_items(directory: Path, after: str | None = None) -> Iterator[Item]:
+    """Image files in a directory, by name, each captured at its modification time."""
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES or (after is not None and path.name <= after):
+            continue
+        yield Item(path.name, path.name, captured_at=datetime.fromtimestamp(path.stat().st_mtime), path=path)
+
+
+def video_items(path: Path, start: datetime | None = None, after: int | None = None, every: int = 1) -> Iterator[Item]:
+    """Every `every`-th frame of a video, timed from `start` (default: its modification time less its length)."""
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    if start is None:
+        duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps > 0 else 0.0
+        start = datetime.fromtimestamp(path.stat().st_mtime) - timedelta(seconds=duration)
+    try:
+        index = -1
+        while True:
+            index += 1
+            skip = (after is not None and index <= after) or index % every
+            # grab() without retrieve() skips decoding frames we don't want
+            if skip:
+                if not cap.grab():
+                    return
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                return
+            offset = timedelta(seconds=index / fps) if fps > 0 else timedelta(0)
+            yield Item(index, f"{path.name}#{index}", captured_at=start + offset, image=frame)
+    finally:
+        cap.release()
+
+
+def prefetch(items: Iterable[T], load: Callable[[T], T], threads: int = 2, depth: int = 8) -> Iterator[T]:
+    """Run load() over items on background threads, yielding in order and at most `depth` ahead."""
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pisky-decode") as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(load, item))
+            if len(pending) >= depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_ahead(items: Iterable[T], depth: int = 8) -> Iterator[T]:
+    """Pull items from a sequential source (e.g. a video decoder) on a background thread."""
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def run() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    thread = threading.Thread(target=run, name="pisky-decode", daemon=True)
+    thread.start()
+    try:
+        while (item := buffer.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting on a full buffer
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(0.05)
+
+
+def load_image(item: Item) -> Item:
+    if item.image is None and item.path is not None:
+        if item.photograph_id is not None and not item.path.exists():
+            # Archived by `pisky gc`
+            data = read_image_bytes(item.path.name)
+            if data is not None:
+                item.image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        else:
+            item.image = cv2.imread(str(item.path))
+    return item
+
+
+@dataclass
+class ReprocessStats:
+    frames: int = 0
+    unreadable: int = 0
+    skipped: int = 0
+    detections: int = 0
+    updated: int = 0
+    added: int = 0
+    seconds: float = 0.0
+
+
+class Reprocessor:
+    """Streams frames through tiling and detection and writes results back in bulk.
+
+    Archived photographs get their detections replaced; frames from other
+    sources are saved as new captures. After every committed batch the
+    position is checkpointed, so an interrupted run continues where it left off.
+    """
+
+    def __init__(
+        self,
+        engine: InferenceEngine,
+        tiler: Tiler,
+        db: Database,
+        writer: ImageWriter,
+        images_dir: Path,
+        checkpoint: Checkpoint,
+        min_confidence: float = 0.33,
+        keep_all: bool = False,
+        batch_size: int = 100,
+    ) -> None:
+        self.engine = engine
+        self.tiler = tiler
+        self.db = db
+        self.writer = writer
+        self.images_dir = images_dir
+        self.checkpoint = checkpoint
+        self.min_confidence = min_confidence
+        self.keep_all = keep_all
+        self.batch_size = batch_size
+        self.stats = ReprocessStats()
+        # Image names of new captures in the batch that is not committed yet
+        self._pending_names: set[str] = set()
+
+    def run(self, items: Iterable[Item]) -> ReprocessStats:
+        started = time.monotonic()
+        updates, captures, pending = [], [], 0
+        for item in items:
+            # Frames are processed as they arrive; only their results wait for the batch
+            self._process(item, updates, captures)
+            pending += 1
+            if pending >= self.batch_size:
+                self._commit(item, updates, captures, started)
+                updates, captures, pending = [], [], 0
+                self._pending_names.clear()
+        if pending:
+            self._commit(item, updates, captures, started)
+        self.stats.seconds = time.monotonic() - started
+        return self.stats
+
+    def _commit(self, last: Item, updates: list, captures: list, started: float) -> None:
+        if updates:
+            self.db.replace_detections(updates)
+            self.stats.updated += len(updates)
+        if captures:
+            self.db.log_captures([capture for capture, _ in captures], tile_plans=[plan for _, plan in captures])
+            self.stats.added += len(captures)
+        # Images for committed rows are on disk before the checkpoint moves past them
+        self.writer.flush()
+        self.checkpoint.save(last.position)
+
+        self.stats.seconds = time.monotonic() - started
+        logger.info(
+            f"{self.stats.frames} frame(s), {self.stats.frames / max(self.stats.seconds, 1e-9):.1f}/s, "
+            f"{self.stats.detections} detection(s), up to {last.name}"
+        )
+
+    def _process(self, item: Item, updates: list, captures: list) -> None:
+        if item.image is None:
+            self.stats.unreadable += 1
+            logger.warning(f"Could not read {item.name}")
+            return
+        self.stats.frames += 1
+
+        tiler = self.tiler
+        tiler.load(item.image)
+        item.image = None
+        tiler.to_rgb()
+        results = self.engine.detect_batch(tiler.tiles, self.min_confidence, rgb=True)
+        detections = [(d.tile_index, d.confidence) for d in merge_detections(tiler.plan, results)]
+        self.stats.detections += len(detections)
+
+        if item.photograph_id is not None:
+            # The saved image is this frame, so tiles are cut from it with this run's plan
+            tile_hashes = {i: dhash(tiler.tiles[i]) for i in {tile_index for tile_index, _ in detections}}
+            updates.append((item.photograph_id, detections, tiler.plan.to_json(), tile_hashes))
+            return
+
+        if not detections and not self.keep_all:
+            return
+        # Files copied together often share a modification time, so the name also carries
+        # a hash of the source item; it stays the same when an interrupted run is repeated
+        base_name = f"{item.captured_at:%Y%m%d%H%M%S}-{item.captured_at.microsecond // 1000:03d}"
+        image_filename = f"{base_name}-{zlib.crc32(item.name.encode()):08x}.jpg"
+        if image_filename in self._pending_names:
+            self.stats.skipped += 1
+            logger.warning(f"Skipped {item.name}: {image_filename} is already taken by another frame")
+            return
+        if (self.images_dir / image_filename).exists():
+            self.stats.skipped += 1
+            logger.info(f"Skipped {item.name}: {image_filename} was saved by an earlier run")
+            return
+        self._pending_names.add(image_filename)
+        self.writer.submit(self.images_dir / image_filename, tiler.copy_bgr(tiler.image))
+        captures.append(((item.captured_at, image_filename, self.keep_all, detections), tiler.plan.cropped().to_json()))
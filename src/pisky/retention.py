@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import cv2
+from loguru import logger
+
+from pisky.archive import DayArchive, archive_name
+from pisky.database import Database
+from pisky.paths import get_archive_dir, get_images_dir
+
+
+@dataclass
+class RetentionPolicy:
+    """What `pisky gc` keeps. Rules set to None are off."""
+
+    keep_all_days: float | None = 7.0  # keep_all captures without birds are pruned after this
+    downscale_width: int | None = None  # ...by shrinking them to this width instead of deleting them
+    archive_days: float | None = 30.0  # older images are packed into one archive per day
+    max_age_days: float | None = None  # older days are deleted outright
+    max_bytes: int | None = None  # the oldest days are deleted while images and archives take more than this
+
+
+@dataclass
+class GcStats:
+    deleted: int = 0
+    downscaled: int = 0
+    archived: int = 0
+    days_dropped: int = 0
+    freed_bytes: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.deleted} photograph(s) deleted, {self.downscaled} downscaled, {self.archived} archived, "
+            f"{self.days_dropped} day(s) dropped, {self.freed_bytes / 1e6:.1f} MB freed"
+        )
+
+
+def file_day(filename: str) -> str:
+    """YYYY-MM-DD from the YYYYMMDD every image filename starts with."""
+    return f"{filename[0:4]}-{filename[4:6]}-{filename[6:8]}"
+
+
+def next_day(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+class GarbageCollector:
+    """Applies a RetentionPolicy to the images directory, the archives and the database.
+
+    Photographs are handled in batches of `batch_size`, each committed in its
+    own short transaction and followed by a `pause`, so a capture loop writing
+    to the same database never waits long. Rows are deleted before their
+    files, so a crash can leave stray files (which later runs sweep up with
+    their day) but never a photograph whose image is gone. With `dry_run`,
+    nothing is changed and the stats say what would have been.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        policy: RetentionPolicy,
+        images_dir: Path | None = None,
+        archive_dir: Path | None = None,
+        batch_size: int = 200,
+        pause: float = 0.1,
+        dry_run: bool = False,
+    ) -> None:
+        self.db = db
+        self.policy = policy
+        self.images_dir = images_dir if images_dir is not None else get_images_dir()
+        self.archive_dir = archive_dir if archive_dir is not None else get_archive_dir()
+        self.batch_size = batch_size
+        self.pause = pause
+        self.dry_run = dry_run
+        self.stats = GcStats()
+        # Image files by photograph (frame and tiles share a stem), listed once per run
+        self.files: dict[str, dict[str, int]] = defaultdict(dict)
+
+    def run(self, now: datetime | None = None) -> GcStats:
+        now = now if now is not None else datetime.now()
+        self.stats = GcStats()
+        self._index_files()
+        policy = self.policy
+        if policy.keep_all_days is not None:
+            self.prune_keep_all((now - timedelta(days=policy.keep_all_days)).isoformat())
+        if policy.max_age_days is not None:
+            self.expire((now - timedelta(days=policy.max_age_days)).date().isoformat())
+        if policy.archive_days is not None:
+            # Today is never archived: captures are still being added to it
+            cutoff = min((now - timedelta(days=policy.archive_days)).date(), now.date())
+            self.archive(cutoff.isoformat())
+        if policy.max_bytes is not None:
+            self.enforce_quota(policy.max_bytes, now.date().isoformat())
+        return self.stats
+
+    def _index_files(self) -> None:
+        self.files.clear()
+        if not self.images_dir.exists():
+            return
+        with os.scandir(self.images_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".jpg") and not entry.name.startswith(".") and entry.is_file():
+                    stem = entry.name[:-4].split("_")[0]
+                    self.files[stem][entry.name] = entry.stat().st_size
+
+    def _batches(self, start: str | None, end: str, **filters) -> Iterator[list[dict]]:
+        """Photographs in [start, end) a batch at a time, pausing between batches."""
+        after = None
+        while True:
+            rows = self.db.get_photographs_between(start, end, after, self.batch_size, **filters)
+            if not rows:
+                return
+            yield rows
+            after = (rows[-1]["captured_at"], rows[-1]["photograph_id"])
+            if not self.dry_run:
+                time.sleep(self.pause)
+
+    def _remove_files(self, stem: str) -> None:
+        for name, size in self.files.pop(stem, {}).items():
+            self.stats.freed_bytes += size
+            if not self.dry_run:
+                (self.images_dir / name).unlink(missing_ok=True)
+
+    def _delete(self, rows: list[dict]) -> None:
+        if not self.dry_run:
+            self.db.delete_photographs([row["photograph_id"] for row in rows])
+        for row in rows:
+            self._remove_files(Path(row["image_path"]).stem)
+        self.stats.deleted += len(rows)
+
+    def prune_keep_all(self, end: str) -> None:
+        """Delete, or downscale, keep_all captures without birds taken before `end`."""
+        width = self.policy.downscale_width
+        for rows in self._batches(None, end, empty_keep_all=True, storage=("file",)):
+            if width is None:
+                self._delete(rows)
+                continue
+            for row in rows:
+                self._downscale(row["image_path"], width)
+            if not self.dry_run:
+                self.db.set_storage([row["photograph_id"] for row in rows], "downscaled")
+            self.stats.downscaled += len(rows)
+
+    def _downscale(self, image_path: str, width: int) -> None:
+        """Shrink a frame to `width` and drop any tile files saved with it, which are only crops of it."""
+        stem = Path(image_path).stem
+        files = self.files.get(stem, {})
+        for name in [name for name in files if name != image_path]:
+            self.stats.freed_bytes += files.pop(name)
+            if not self.dry_run:
+                (self.images_dir / name).unlink(missing_ok=True)
+        if image_path not in files or self.dry_run:
+            return
+
+        path = self.images_dir / image_path
+        image = cv2.imread(str(path))
+        if image is None:
+            logger.warning(f"Could not read {image_path}, leaving it as it is")
+            return
+        h, w = image.shape[:2]
+        if w <= width:
+            return
+        image = cv2.resize(image, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            logger.warning(f"Could not encode {image_path}, leaving it as it is")
+            return
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(encoded.tobytes())
+        os.replace(tmp_path, path)
+        self.stats.freed_bytes += files[image_path] - len(encoded)
+        files[image_path] = len(encoded)
+
+    def _days(self, end: str) -> list[str]:
+        """Days before `end` with photographs, image files or an archive, oldest first."""
+        days = set(self.db.get_capture_days(end))
+        days.update(day for day in map(file_day, self.files) if day < end)
+        if self.archive_dir.exists():
+            days.update(day for day in (file_day(p.name) for p in self.archive_dir.glob("*.db")) if day < end)
+        return sorted(days)
+
+    def drop_day(self, day: str) -> None:
+        """Delete a whole day: its photographs, their image files and its archive."""
+        for rows in self._batches(day, next_day(day)):
+            self._delete(rows)
+        # Files left by interrupted runs or removed rows go with their day
+        prefix = day.replace("-", "")
+        for stem in [stem for stem in self.files if stem.startswith(prefix)]:
+            self._remove_files(stem)
+        archive = self.archive_dir / archive_name(prefix)
+        if archive.exists():
+            self.stats.freed_bytes += archive.stat().st_size
+            if not self.dry_run:
+                archive.unlink()
+        self.stats.days_dropped += 1
+        logger.info(f"Dropped {day}")
+
+    def expire(self, end: str) -> None:
+        """Delete every day before `end`."""
+        for day in self._days(end):
+            self.drop_day(day)
+
+    def archive(self, end: str) -> None:
+        """Pack the images of every day before `end` into that day's archive."""
+        for day in self.db.get_capture_days(end, exclude_storage="archived"):
+            batches = self._batches(day, next_day(day), storage=("file", "downscaled"))
+            if self.dry_run:
+                self.stats.archived += sum(len(rows) for rows in batches)
+                continue
+            with DayArchive(self.archive_dir / archive_name(day.replace("-", ""))) as archive:
+                archived = archive.names()
+                for rows in batches:
+                    self._archive_batch(archive, archived, rows)
+            logger.info(f"Archived {day}")
+
+    def _archive_batch(self, archive: DayArchive, archived: set[str], rows: list[dict]) -> None:
+        stems, done = [], []
+
+        def images() -> Iterator[tuple[str, int, bytes]]:
+            # Read as the archive inserts them, so only one image is in memory at a time
+            for row in rows:
+                stem = Path(row["image_path"]).stem
+                files = self.files.get(stem)
+                if not files:
+                    if row["image_path"] in archived:
+                        # Packed by a run that stopped before recording it
+                        done.append(row["photograph_id"])
+                    else:
+                        logger.warning(f"{row['image_path']} is missing, not archiving it")
+                    continue
+                for name in files:
+                    path = self.images_dir / name
+                    yield name, path.stat().st_mtime_ns, path.read_bytes()
+                stems.append(stem)
+                done.append(row["photograph_id"])
+
+        # Archive, then delete the files, then record it: each step can be redone after a crash
+        archive.add(images())
+        for stem in stems:
+            for name in self.files.pop(stem):
+                (self.images_dir / name).unlink(missing_ok=True)
+        self.db.set_storage(done, "archived")
+        self.stats.archived += len(done)
+
+    def _total_bytes(self) -> int:
+        total = sum(size for files in self.files.values() for size in files.values())
+        if self.archive_dir.exists():
+            total += sum(p.stat().st_size for p in self.archive_dir.glob("*.db"))
+        return total
+
+    def enforce_quota(self, max_bytes: int, today: str) -> None:
+        """Drop the oldest days until images and archives fit in `max_bytes`, never touching today."""
+        total = self._total_bytes()
+        dropped: set[str] = set()
+        while total > max_bytes:
+            days = [day for day in self._days(today) if day not in dropped]
+            if not days:
+                logger.warning(f"Still {total / 1e6:.1f} MB with only today's images left")
+                return
+            freed = self.stats.freed_bytes
+            self.drop_day(days[0])
+            dropped.add(days[0])
+            total -= self.stats.freed_bytes - freed
@@ -0,0 +1,59 @@
+import time
+
+from loguru import logger
+
+
+class AdaptiveSchedule:
+    """Picks the wait before the next capture from what recent captures saw.
+
+    A detection starts a burst: captures every `burst_interval` seconds until
+    `burst_duration` seconds pass without another bird. Outside a burst each
+    capture that sees nothing multiplies the wait by `backoff`, from
+    `interval` up to `max_interval`. Dark frames go straight to `max_interval`,
+    and the first frame with light again starts over from `interval`.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        burst_interval: float = 2.0,
+        burst_duration: float = 300.0,
+        max_interval: float = 300.0,
+        backoff: float = 2.0,
+    ) -> None:
+        self.interval = interval
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.max_interval = max(max_interval, interval)
+        self.backoff = backoff
+        self.delay = interval
+        self.burst_until: float | None = None
+        self.dark = False
+
+    def next_delay(self, detected: bool, dark: bool = False, now: float | None = None) -> float:
+        """Record the latest capture and return the seconds to wait before the next one."""
+        now = time.monotonic() if now is None else now
+        if detected:
+            if self.burst_until is None:
+                logger.info(f"Bird seen, capturing every {self.burst_interval:g}s")
+            self.burst_until = now + self.burst_duration
+        if self.burst_until is not None:
+            if now < self.burst_until:
+                return self.burst_interval
+            logger.info(f"No birds for {self.burst_duration:g}s, backing off from every {self.interval:g}s")
+            self.burst_until = None
+            self.delay = self.interval
+
+        if dark != self.dark:
+            self.dark = dark
+            if dark:
+                logger.info(f"Too dark, capturing every {self.max_interval:g}s")
+            else:
+                logger.info(f"Light again, capturing every {self.interval:g}s")
+                self.delay = self.interval
+        if dark:
+            return self.max_interval
+
+        delay = self.delay
+        self.delay = min(self.delay * self.backoff, self.max_interval)
+        return delay
@@ -1,14 +1,31 @@
-import subprocess
-import sys
+import asyncio
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from datetime import datetime
+from email.utils import formatdate
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from loguru import logger
 from pydantic import BaseModel
 
-from pisky.database import Database
+from pisky.archive import read_archived
+from pisky.database import DatabasePool
+from pisky.events import DatabaseWatcher, EventBroker
+from pisky.metrics import metrics
 from pisky.paths import get_images_dir
+from pisky.preview import FrameHub
+from pisky.schedule import AdaptiveSchedule
+from pisky.thumbnails import THUMBNAIL_WIDTHS, ThumbnailCache
+
+if TYPE_CHECKING:
+    from pisky.dedupe import VisitTracker
 
 
 class PhotographSummary(BaseModel):
@@ -19,20 +36,47 @@ class PhotographSummary(BaseModel):
     detection_count: int
 
 
+class PhotographPage(BaseModel):
+    photographs: list[PhotographSummary]
+    next_cursor: str | None
+
+
 class Detection(BaseModel):
     tile_index: int
     confidence: float
     tile_url: str
 
 
+class TileGrid(BaseModel):
+    cols: int
+    rows: int
+
+
 class PhotographDetail(BaseModel):
     photograph_id: int
     captured_at: str
     image_url: str
     keep_all: bool
+    visit_id: int | None
+    tile_grid: TileGrid | None  # None for captures from before the grid was recorded
     detections: list[Detection]
 
 
+class VisitSummary(BaseModel):
+    visit_id: int
+    started_at: str
+    ended_at: str
+    frame_count: int
+    best_confidence: float | None
+    best_photograph_id: int | None
+    image_url: str | None
+
+
+class VisitPage(BaseModel):
+    visits: list[VisitSummary]
+    next_cursor: str | None
+
+
 class Stats(BaseModel):
     total_photographs: int
     total_detections: int
@@ -43,11 +87,276 @@ class ShootResponse(BaseModel):
     message: str
 
 
+class ModelInfo(BaseModel):
+    name: str
+    backend: str
+    file: str
+    available: bool
+
+
+class ModelList(BaseModel):
+    current: str | None
+    default: str
+    models: list[ModelInfo]
+
+
+class ModelRequest(BaseModel):
+    name: str
+
+
+# Captured images are never rewritten, so browsers and nginx may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# API responses may be cached but must be revalidated (cheaply, via ETag) on every poll
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class CaptureService:
+    """Owns the camera for the server and runs every capture on a single thread.
+
+    Captures come from API requests, from the watch loop (when `watch_interval`
+    is set) and from the live preview, which grabs frames between scheduled
+    captures only while someone is viewing it. A `schedule` varies the watch
+    interval with recent detections and daylight, and `motion_threshold`
+    gates the watch loop's detections on motion as `pisky watch` does. Outside of watch mode the
+    camera is released after `idle_timeout` seconds without use so
+    `pisky shoot` and `pisky watch` can still open it.
+    """
+
+    def __init__(
+        self,
+        camera_index: int = 0,
+        idle_timeout: float = 60.0,
+        watch_interval: float | None = None,
+        preview_fps: float = 10.0,
+        on_capture=None,
+        model: str | None = None,
+        schedule: AdaptiveSchedule | None = None,
+        dark_threshold: float | None = None,
+        visits: "VisitTracker | None" = None,
+        keep_all: bool = False,
+        workers: int | None = None,
+        motion_threshold: float | None = None,
+        tiling: str = "crop",
+        overlap: int = 0,
+        jpeg_quality: int = 95,
+        num_threads: int | None = None,
+        xnnpack: bool | None = None,
+    ) -> None:
+        self.camera_index = camera_index
+        self.model = model
+        self.keep_all = keep_all
+        self.workers = workers
+        self.motion_threshold = motion_threshold
+        self.tiling = tiling
+        self.overlap = overlap
+        self.jpeg_quality = jpeg_quality
+        self.num_threads = num_threads
+        self.xnnpack = xnnpack
+        self.schedule = schedule
+        self.dark_threshold = dark_threshold
+        self.visits = visits
+        self.idle_timeout = idle_timeout
+        self.watch_interval = watch_interval
+        self.preview_fps = preview_fps
+        self.on_capture = on_capture
+        self.preview = FrameHub()
+        self.session = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pisky-capture")
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._last_used: float | None = None
+        # Gate frames at the last motion gate summary
+        self._gate_logged = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        """Check for preview viewers now rather than at the next idle poll."""
+        self._wake.set()
+
+    async def shoot(self, keep_all: bool = True) -> int | None:
+        """Capture on the capture thread. Returns the photograph_id it saved."""
+        try:
+            return await self._submit(self._shoot, keep_all, True)
+        finally:
+            self._last_used = asyncio.get_running_loop().time()
+
+    async def set_model(self, model: str) -> str:
+        """Use another model, reloading the detector now if the camera session is open."""
+        if self.session is None:
+            # Checked now, so a bad name fails here rather than at the next capture. Resolving
+            # the default model may download it, so it runs off the event loop
+            from pisky.models import resolve_model
+
+            spec = await self._submit(resolve_model, model)
+        else:
+            # A model that fails to load leaves the current one in place
+            spec = await self._submit(self.session.reload_model, model)
+        self.model = model
+        return spec.name
+
+    async def _submit(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.schedule is not None:
+            logger.info(
+                f"Watching camera {self.camera_index} every {self.watch_interval:g}-{self.schedule.max_interval:g}s, "
+                f"every {self.schedule.burst_interval:g}s after a bird"
+            )
+        elif self.watch_interval is not None:
+            logger.info(f"Watching camera {self.camera_index} every {self.watch_interval:g}s")
+        next_shot = loop.time()
+        while True:
+            now = loop.time()
+            if self.watch_interval is not None and now >= next_shot:
+                next_shot = now + self.watch_interval
+                try:
+                    photograph_id, delay = await self._submit(self._watch_shot)
+                    next_shot = now + delay
+                    if photograph_id is not None and self.on_capture is not None:
+                        self.on_capture()
+                except Exception:
+                    logger.exception("Capture failed")
+                continue
+
+            if self.preview.viewers:
+                try:
+                    await self._submit(self._preview_frame)
+                    self._last_used = loop.time()
+                    delay = 1 / self.preview_fps
+                except Exception:
+                    logger.exception("Preview capture failed")
+                    delay = 5.0
+            else:
+                if self.watch_interval is None and self._last_used is not None:
+                    if now - self._last_used >= self.idle_timeout:
+                        self._last_used = None
+                        await self._submit(self._release_camera)
+                delay = 0.5
+            if self.watch_interval is not None:
+                delay = min(delay, max(0.0, next_shot - loop.time()))
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _open_session(self):
+        if self.session is None:
+            # Deferred so the server doesn't load the detector until it captures
+            from pisky.capture import CaptureSession
+            from pisky.motion import MotionGate
+            from pisky.tiling import Tiler
+            from pisky.writer import ImageWriter
+
+            session = CaptureSession(
+                self.camera_index,
+                self.workers,
+                MotionGate(self.motion_threshold) if self.motion_threshold is not None else None,
+                Tiler.for_tiling(self.tiling, self.overlap),
+                ImageWriter(quality=self.jpeg_quality),
+                preview=self.preview,
+                model=self.model,
+                num_threads=self.num_threads,
+                xnnpack=self.xnnpack,
+                dark_threshold=self.dark_threshold,
+                visits=self.visits,
+            )
+            try:
+                session.open()
+            except Exception:
+                session.close()
+                raise
+            self.session = session
+        return self.session
+
+    def _shoot(self, keep_all: bool, flush: bool) -> int | None:
+        session = self._open_session()
+        photograph_id = session.shoot(keep_all)
+        if flush:
+            # The caller will fetch the image next, so make sure it's on disk
+            session.writer.flush()
+        return photograph_id
+
+    def _watch_shot(self) -> tuple[int | None, float]:
+        """A scheduled capture, and how long to wait before the next one."""
+        # on_capture() tells the dashboard, which fetches the image at once, so flush as API shoots do
+        photograph_id = self._shoot(self.keep_all, True)
+        gate = self.session.gate
+        if gate is not None and gate.frames // 100 > self._gate_logged // 100:
+            self._gate_logged = gate.frames
+            logger.info(f"Motion gate: {gate.summary()}")
+        if self.schedule is None:
+            return photograph_id, self.watch_interval
+        delay = self.schedule.next_delay(bool(self.session.last_detections), self.session.last_dark)
+        return photograph_id, delay
+
+    def _preview_frame(self) -> None:
+        self._open_session().preview_frame()
+
+    def _release_camera(self) -> None:
+        if self.session is not None:
+            self.session.release_camera()
+            logger.info("Camera released after idle timeout")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.session is not None:
+            await self._submit(self.session.close)
+            self.session = None
+        self._executor.shutdown(wait=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: nothing to do
+    app.state.db = DatabasePool()
+    app.state.db.open()
+    app.state.thumbnails = ThumbnailCache()
+    app.state.events = EventBroker()
+    app.state.watcher = DatabaseWatcher(
+        app.state.events,
+        app.state.db,
+        lambda photo: photograph_detail(photo).model_dump(),
+    )
+    app.state.capture = CaptureService(
+        getattr(app.state, "camera_index", 0),
+        watch_interval=getattr(app.state, "watch_interval", None),
+        on_capture=app.state.watcher.wake,
+        model=getattr(app.state, "model", None),
+        schedule=getattr(app.state, "schedule", None),
+        dark_threshold=getattr(app.state, "dark_threshold", None),
+        visits=getattr(app.state, "visits", None),
+        **getattr(app.state, "capture_options", {}),
+    )
+    app.state.watcher.start()
+    app.state.capture.start()
     yield
-    # Shutdown: nothing to do
+    await app.state.capture.close()
+    await app.state.watcher.stop()
+    app.state.db.close()
 
 
 app = FastAPI(
@@ -67,106 +376,402 @@ app.add_middleware(
 )
 
 
-@app.get("/api/photographs", response_model=list[PhotographSummary])
-def list_photographs(limit: int = 50):
-    """List recent photographs with detection counts."""
-    with Database() as db:
-        rows = db.get_recent_photographs(limit)
-    return [
-        PhotographSummary(
-            photograph_id=row["photograph_id"],
-            captured_at=row["captured_at"],
-            image_path=row["image_path"],
-            keep_all=bool(row["keep_all"]),
-            detection_count=row["detection_count"],
+def parse_cursor(cursor: str) -> tuple[str, int]:
+    """Parse a `<captured_at>,<photograph_id>` cursor."""
+    captured_at, _, photograph_id = cursor.rpartition(",")
+    try:
+        return captured_at, int(photograph_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def parse_time(value: str, name: str) -> str:
+    """Parse an ISO 8601 date or time into the local-time isoformat captured_at is stored in."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO 8601 date or time") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+@app.get("/api/photographs", response_model=PhotographPage)
+def list_photographs(
+    limit: int = Query(50, ge=1, le=500),
+    before: str | None = Query(None, description="Cursor from a previous page's next_cursor"),
+    start: str | None = Query(None, alias="from", description="Earliest captured_at (inclusive)"),
+    end: str | None = Query(None, alias="to", description="Latest captured_at (exclusive)"),
+    min_confidence: float | None = Query(None, ge=0, le=1),
+    has_detections: bool | None = None,
+    *,
+    request: Request,
+    response: Response,
+):
+    """List photographs, newest first, one page at a time."""
+    with app.state.db.connection() as db:
+        etag = f'"{db.get_revision()}-{zlib.crc32(request.url.query.encode()):08x}"'
+        if is_not_modified(request, etag):
+            return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+
+        # One extra row tells us whether there is a next page
+        rows = db.list_photographs(
+            limit + 1,
+            before=parse_cursor(before) if before else None,
+            start=parse_time(start, "from") if start else None,
+            end=parse_time(end, "to") if end else None,
+            min_confidence=min_confidence,
+            has_detections=has_detections,
         )
-        for row in rows
-    ]
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['captured_at']},{rows[-1]['photograph_id']}"
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    return PhotographPage(
+        photographs=[
+            PhotographSummary(
+                photograph_id=row["photograph_id"],
+                captured_at=row["captured_at"],
+                image_path=row["image_path"],
+                keep_all=bool(row["keep_all"]),
+                detection_count=row["detection_count"],
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
 
-@app.get("/api/photographs/{photograph_id}", response_model=PhotographDetail)
-def get_photograph(photograph_id: int):
-    """Get a photograph with its detections."""
-    with Database() as db:
-        photo = db.get_photograph(photograph_id)
-    if photo is None:
-        raise HTTPException(status_code=404, detail="Photograph not found")
 
-    # Build tile URLs from image path
-    base_name = photo["image_path"].rsplit(".", 1)[0]
+def photograph_detail(photo: dict) -> PhotographDetail:
+    """Build the API view of a photograph row with its detections."""
     detections = [
         Detection(
             tile_index=d["tile_index"],
             confidence=d["confidence"],
-            tile_url=f"/images/{base_name}_{d['tile_index']:02d}.jpg",
+            tile_url=f"/api/photographs/{photo['photograph_id']}/tiles/{d['tile_index']}",
         )
         for d in photo["detections"]
     ]
+    tile_grid = None
+    if photo.get("tile_plan"):
+        plan = json.loads(photo["tile_plan"])
+        tile_grid = TileGrid(cols=plan["cols"], rows=plan["rows"])
 
     return PhotographDetail(
         photograph_id=photo["photograph_id"],
         captured_at=photo["captured_at"],
         image_url=f"/images/{photo['image_path']}",
         keep_all=bool(photo["keep_all"]),
+        visit_id=photo.get("visit_id"),
+        tile_grid=tile_grid,
         detections=detections,
     )
 
 
+@app.get("/api/photographs/{photograph_id}", response_model=PhotographDetail)
+def get_photograph(photograph_id: int):
+    """Get a photograph with its detections."""
+    with app.state.db.connection() as db:
+        photo = db.get_photograph(photograph_id)
+    if photo is None:
+        raise HTTPException(status_code=404, detail="Photograph not found")
+    return photograph_detail(photo)
+
+
+@app.get("/api/photographs/{photograph_id}/tiles/{tile_index}")
+def serve_tile(request: Request, photograph_id: int, tile_index: int):
+    """Serve one tile of a photograph, cut from its frame and cached on first request."""
+    with app.state.db.connection() as db:
+        photo = db.get_photograph(photograph_id)
+    if photo is None:
+        raise HTTPException(status_code=404, detail="Photograph not found")
+    if photo["tile_plan"] is None:
+        # Older captures saved each tile as its own file
+        stem = photo["image_path"].rsplit(".", 1)[0]
+        return serve_image(request, f"{stem}_{tile_index:02d}.jpg", w=None)
+
+    image_path, data, mtime_ns, size = find_image(photo["image_path"])
+    # Reprocessing can retile a frame, so tiles are revalidated rather than cached forever
+    plan_crc = zlib.crc32(photo["tile_plan"].encode())
+    etag = f'"{mtime_ns:x}-{size:x}-{plan_crc:08x}-t{tile_index}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+
+    try:
+        tile_path = app.state.thumbnails.tile(image_path, photo["tile_plan"], tile_index, data)
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Tile not found") from None
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from None
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    return FileResponse(tile_path, media_type="image/jpeg", headers=headers)
+
+
+@app.get("/api/visits", response_model=VisitPage)
+def list_visits(
+    limit: int = Query(50, ge=1, le=500),
+    before: str | None = Query(None, description="Cursor from a previous page's next_cursor"),
+    *,
+    request: Request,
+    response: Response,
+):
+    """List visits (runs of near-identical captures of a bird), newest first, with their best frame."""
+    with app.state.db.connection() as db:
+        etag = f'"{db.get_revision()}-{zlib.crc32(request.url.query.encode()):08x}"'
+        if is_not_modified(request, etag):
+            return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+        rows = db.list_visits(limit + 1, before=parse_cursor(before) if before else None)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['started_at']},{rows[-1]['visit_id']}"
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    return VisitPage(
+        visits=[
+            VisitSummary(
+                visit_id=row["visit_id"],
+                started_at=row["started_at"],
+                ended_at=row["ended_at"],
+                frame_count=row["frame_count"],
+                best_confidence=row["best_confidence"],
+                best_photograph_id=row["best_photograph_id"],
+                image_url=f"/images/{row['image_path']}" if row["image_path"] else None,
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
 @app.get("/api/stats", response_model=Stats)
-def get_stats():
+def get_stats(request: Request, response: Response):
     """Get summary statistics."""
-    with Database() as db:
+    with app.state.db.connection() as db:
+        etag = f'"{db.get_revision()}"'
+        if is_not_modified(request, etag):
+            return not_modified(etag, REVALIDATE_CACHE_CONTROL)
         stats = db.get_stats()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
     return Stats(**stats)
 
 
-@app.post("/api/shoot", response_model=ShootResponse)
-def trigger_shoot():
-    """Trigger a capture with --keep-all flag."""
-    result = subprocess.run(
-        [sys.executable, "-m", "pisky.cli", "shoot", "--keep-all"],
-        capture_output=True,
-        text=True,
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-Sent Events: a `photograph` event for each new capture, then `stats`."""
+    queue = app.state.events.subscribe()
+    app.state.watcher.wake()
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            app.state.events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    if result.returncode != 0:
-        return ShootResponse(
-            photograph_id=None,
-            message=f"Capture failed: {result.stderr}",
-        )
 
-    # Try to get the most recent photograph
-    with Database() as db:
-        recent = db.get_recent_photographs(limit=1)
-        if recent:
-            return ShootResponse(
-                photograph_id=recent[0]["photograph_id"],
-                message="Capture complete",
-            )
-        return ShootResponse(
-            photograph_id=None,
-            message="Capture complete but no photograph saved",
-        )
+@app.get("/api/stream.mjpg")
+async def stream_preview(
+    request: Request,
+    fps: float = Query(5.0, gt=0, le=30, description="Maximum frames per second for this viewer"),
+    overlay: bool = Query(False, description="Draw the tile grid and detection boxes"),
+):
+    """Live MJPEG preview from the server's capture loop, shared by all viewers."""
+    capture = app.state.capture
+    hub = capture.preview
+    hub.add_viewer()
+    capture.wake()
+
+    async def stream():
+        try:
+            seq = 0
+            while not await request.is_disconnected():
+                sent_at = asyncio.get_running_loop().time()
+                frame = await hub.next_jpeg(seq, overlay, 1.0)
+                if frame is None:
+                    continue
+                seq, jpeg = frame
+                yield (
+                    b"--frame\r\nContent-Type: image/jpeg\r\n"
+                    + f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                    + jpeg
+                    + b"\r\n"
+                )
+                # Slow viewers skip frames instead of queueing them
+                await asyncio.sleep(max(0.0, 1 / fps - (asyncio.get_running_loop().time() - sent_at)))
+        finally:
+            hub.remove_viewer()
+
+    return StreamingResponse(
+        stream(),
+        media_type="multipart/x-mixed-replace; boundary=frame",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/shoot", response_model=ShootResponse)
+async def trigger_shoot():
+    """Capture now, keeping the image even if no birds are detected."""
+    try:
+        photograph_id = await app.state.capture.shoot(keep_all=True)
+        app.state.watcher.wake()
+    except Exception as e:
+        logger.exception("Capture failed")
+        return ShootResponse(photograph_id=None, message=f"Capture failed: {e}")
+
+    if photograph_id is None:
+        return ShootResponse(photograph_id=None, message="Capture failed: could not read a frame")
+    return ShootResponse(photograph_id=photograph_id, message="Capture complete")
+
+
+@app.get("/api/models", response_model=ModelList)
+def list_models():
+    """Models in the registry, and the one captures use."""
+    from pisky.models import load_registry, model_spec
+
+    capture = app.state.capture
+    registry = load_registry()
+    if capture.session is not None and capture.session.engine is not None:
+        current = capture.session.engine.model.name
+    else:
+        current = capture.model or os.environ.get("PISKY_MODEL") or registry["default"]
+    models = []
+    for name, entry in registry["models"].items():
+        spec = model_spec(name, entry)
+        models.append(ModelInfo(name=name, backend=spec.backend, file=spec.path.name, available=spec.path.exists()))
+    return ModelList(current=current, default=registry["default"], models=models)
+
+
+@app.post("/api/model", response_model=ModelList)
+async def select_model(request: ModelRequest):
+    """Switch captures to a registered model without restarting the server."""
+    from pisky.models import load_registry
+
+    # Only registered models, so API clients can't point the server at arbitrary files
+    if request.name not in load_registry()["models"]:
+        raise HTTPException(status_code=400, detail=f"Unknown model {request.name!r}")
+    try:
+        name = await app.state.capture.set_model(request.name)
+    except (ValueError, RuntimeError, OSError) as e:
+        logger.warning(f"Could not load model {request.name}: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not load model: {e}") from None
+    logger.info(f"Captures now use model {name}")
+    return list_models()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Pipeline stage timings and live connection counts for Prometheus."""
+    gauges = [
+        ("pisky_event_subscribers", "Connected Server-Sent Events clients.", app.state.events.subscriber_count),
+        ("pisky_preview_viewers", "Connected live preview viewers.", app.state.capture.preview.viewers),
+    ]
+    lines = [metrics.to_prometheus()]
+    for name, help_text, value in gauges:
+        lines.append(f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {value}\n")
+    return PlainTextResponse("".join(lines), media_type="text/plain; version=0.0.4")
+
+
+def find_image(filename: str) -> tuple[Path, bytes | None, int, int]:
+    """Locate an image as (path, data, mtime_ns, size); data is only set for archived images."""
+    image_path = get_images_dir() / filename
+    try:
+        stat = image_path.stat()
+        return image_path, None, stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        # `pisky gc` packs old images into one archive per day
+        archived = read_archived(filename)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Image not found") from None
+        data, mtime_ns = archived
+        return image_path, data, mtime_ns, len(data)
 
 
 @app.get("/images/{filename}")
-def serve_image(filename: str):
-    """Serve an image from the images directory."""
+def serve_image(
+    request: Request,
+    filename: str,
+    w: int | None = Query(None, description=f"Thumbnail width, one of {THUMBNAIL_WIDTHS}"),
+):
+    """Serve an image from the images directory or its day's archive, optionally as a cached thumbnail."""
     images_dir = get_images_dir()
     image_path = images_dir / filename
 
-    if not image_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-
     # Prevent path traversal
     if not image_path.resolve().is_relative_to(images_dir.resolve()):
         raise HTTPException(status_code=403, detail="Access denied")
 
-    return FileResponse(image_path, media_type="image/jpeg")
-
-
-def run_server(host: str = "0.0.0.0", port: int = 8000) -> None:
-    """Run the FastAPI server."""
+    if w is not None and w not in THUMBNAIL_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"Width must be one of {THUMBNAIL_WIDTHS}")
+
+    image_path, data, mtime_ns, size = find_image(filename)
+
+    # Validators come from the original file, so a thumbnail's ETag doesn't change
+    # when the cache touches or regenerates it, or when the image is archived
+    etag = f'"{mtime_ns:x}-{size:x}{f"-w{w}" if w else ""}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime_ns / 1e9, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+    }
+    if w is not None:
+        try:
+            image_path = app.state.thumbnails.get(image_path, w, data)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e)) from None
+    elif data is not None:
+        return Response(content=data, media_type="image/jpeg", headers=headers)
+
+    # FileResponse answers Range requests itself
+    return FileResponse(image_path, media_type="image/jpeg", headers=headers)
+
+
+def run_server(
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    camera_index: int = 0,
+    watch_interval: float | None = None,
+    model: str | None = None,
+    schedule: AdaptiveSchedule | None = None,
+    dark_threshold: float | None = None,
+    visits: "VisitTracker | None" = None,
+    **capture_options,
+) -> None:
+    """Run the FastAPI server.
+
+    `capture_options` (keep_all, workers, motion_threshold, tiling, ...) are
+    passed on to the CaptureService.
+    """
     import uvicorn
 
+    app.state.camera_index = camera_index
+    app.state.watch_interval = watch_interval
+    app.state.model = model
+    app.state.schedule = schedule
+    app.state.dark_threshold = dark_threshold
+    app.state.visits = visits
+    app.state.capture_options = capture_options
     uvicorn.run(app, host=host, port=port)
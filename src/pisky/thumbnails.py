@@ -0,0 +1,218 @@
+import os
+import threading
+import uuid
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from pisky.metrics import timed
+from pisky.paths import get_cache_dir
+
+if TYPE_CHECKING:
+    from pisky.tiling import TilePlan
+
+# Widths the dashboard asks for; anything else is rejected so the cache can't be flooded
+THUMBNAIL_WIDTHS = (160, 320, 640, 960)
+
+# Enough of a JPEG to reach its frame header past any EXIF or other metadata segments
+HEADER_BYTES = 64 * 1024
+
+
+class ThumbnailCache:
+    """Downscaled JPEGs and tile crops generated on demand and kept on disk, least recently used first out.
+
+    A cached file's mtime is bumped on every hit, so eviction deletes the
+    files that have gone unused the longest once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: Path | None = None, max_bytes: int = 256 * 1024 * 1024, quality: int = 80) -> None:
+        self.cache_dir = cache_dir if cache_dir is not None else get_cache_dir() / "thumbnails"
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        # One lock per frame being cut, so misses on other frames don't wait behind it
+        self._tile_locks: dict[str, threading.Lock] = {}
+        self._size = sum(f.stat().st_size for f in self.cache_dir.rglob("*.jpg")) if self.cache_dir.exists() else 0
+
+    def get(self, source: Path, width: int, data: bytes | None = None) -> Path:
+        """Return the path of a `width`-pixel-wide copy of source, generating it if needed.
+
+        `data` is the encoded source image, for images that are no longer files (e.g. archived).
+        """
+        if width not in THUMBNAIL_WIDTHS:
+            raise ValueError(f"Unsupported thumbnail width {width}")
+        path = self.cache_dir / str(width) / source.name
+        if _touch(path):
+            return path
+
+        # Only cache misses need OpenCV, so the server starts without it
+        import cv2
+
+        with timed("thumbnail"):
+            image = _read_reduced(source, width, data)
+            if image is None:
+                raise ValueError(f"Could not read {source}")
+            h, w = image.shape[:2]
+            if w > width:
+                image = cv2.resize(image, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError(f"Could not encode thumbnail of {source}")
+        self._store(path, encoded.tobytes())
+        return path
+
+    def tile(self, source: Path, tile_plan: str, index: int, data: bytes | None = None) -> Path:
+        """Return the path of one tile of a frame, cutting it from the frame if needed.
+
+        `tile_plan` is the TilePlan the frame was tiled with, as JSON. A frame
+        that has since been downscaled is cut to scale. On a miss every tile of
+        the frame is cut, since the dashboard asks for all of them at once.
+        Raises IndexError for a tile that isn't in the plan.
+        """
+        # Reprocessing may retile a frame, so the plan is part of the name
+        directory = self.cache_dir / "tiles"
+        stem = f"{source.stem}-{zlib.crc32(tile_plan.encode()):08x}"
+        path = directory / f"{stem}_{index:02d}.jpg"
+        if _touch(path):
+            return path
+
+        from pisky.tiling import TilePlan
+
+        plan = TilePlan.from_json(tile_plan)
+        plan.tile_box(index)  # IndexError before any work for a tile outside the grid
+        with self._lock:
+            lock = self._tile_locks.setdefault(stem, threading.Lock())
+        try:
+            with lock:
+                # Concurrent requests for the same frame wait for the first to cut it
+                if _touch(path):
+                    return path
+                self._cut_tiles(source, plan, directory, stem, data)
+        finally:
+            # Later requests find the tiles cached, so they don't need this lock
+            with self._lock:
+                if self._tile_locks.get(stem) is lock:
+                    del self._tile_locks[stem]
+        return path
+
+    def _cut_tiles(self, source: Path, plan: "TilePlan", directory: Path, stem: str, data: bytes | None) -> None:
+        """Cut and cache every tile of a frame."""
+        import cv2
+
+        with timed("tile"):
+            if data is not None:
+                import numpy as np
+
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                image = cv2.imread(str(source))
+            if image is None:
+                raise ValueError(f"Could not read {source}")
+            scale = image.shape[1] / plan.frame_w
+            tiles = []
+            for i in range(plan.inferences):
+                x, y, w, h = (round(v * scale) for v in plan.tile_box(i))
+                crop = image[y : y + h, x : x + w]
+                ok, encoded = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    raise ValueError(f"Could not encode tile {i} of {source}")
+                tiles.append(encoded.tobytes())
+        for i, encoded in enumerate(tiles):
+            self._store(directory / f"{stem}_{i:02d}.jpg", encoded)
+
+    def _store(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used thumbnails until the cache is 90% of max_bytes."""
+        files = []
+        for f in self.cache_dir.rglob("*.jpg"):
+            try:
+                stat = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+        files.sort()
+
+        self._size = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, f in files:
+            if self._size <= target:
+                break
+            f.unlink(missing_ok=True)
+            self._size -= size
+            removed += 1
+        logger.info(f"Evicted {removed} thumbnail(s), cache now {self._size / 1e6:.1f} MB")
+
+
+def _touch(path: Path) -> bool:
+    """Mark a cached file as just used; False if it isn't cached."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _read_reduced(source: Path, width: int, data: bytes | None = None):
+    """Decode a JPEG at the smallest DCT scale (1/8, 1/4, 1/2) that is still at least `width` wide.
+
+    The scale is picked from the width in the JPEG header, so the image is decoded only once.
+    """
+    import cv2
+
+    if data is None:
+        try:
+            with open(source, "rb") as f:
+                head = f.read(HEADER_BYTES)
+        except FileNotFoundError:
+            return None
+    else:
+        head = data[:HEADER_BYTES]
+
+    flag = cv2.IMREAD_COLOR
+    source_width = _jpeg_width(head)
+    if source_width is not None:
+        reductions = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+        for scale, reduced in reductions:
+            # Reduced decodes round the size up
+            if -(-source_width // scale) >= width:
+                flag = reduced
+                break
+
+    if data is not None:
+        import numpy as np
+
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    return cv2.imread(str(source), flag)
+
+
+def _jpeg_width(head: bytes) -> int | None:
+    """Image width from the start-of-frame segment in the first bytes of a JPEG, or None if it isn't there."""
+    if head[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC), which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(head[i + 7 : i + 9], "big")
+        i += 2 + int.from_bytes(head[i + 2 : i + 4], "big")
+    return None
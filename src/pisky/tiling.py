@@ -0,0 +1,294 @@
+import json
+import math
+from dataclasses import asdict, dataclass, replace
+from typing import TYPE_CHECKING
+
+import cv2
+import numpy as np
+from numpy import ndarray
+from numpy.lib.stride_tricks import as_strided
+
+from pisky.grid import GRID_COLS, GRID_ROWS, TILE_SIZE
+from pisky.metrics import timed
+
+if TYPE_CHECKING:
+    from pisky.detector import Detection
+
+
+@dataclass(frozen=True)
+class TilePlan:
+    """Placement of a uniform tile grid within a frame."""
+
+    frame_w: int
+    frame_h: int
+    tile_size: int
+    cols: int
+    rows: int
+    step_x: int
+    step_y: int
+
+    @property
+    def width(self) -> int:
+        return self.tile_size + (self.cols - 1) * self.step_x
+
+    @property
+    def height(self) -> int:
+        return self.tile_size + (self.rows - 1) * self.step_y
+
+    @property
+    def x_offset(self) -> int:
+        return (self.frame_w - self.width) // 2
+
+    @property
+    def y_offset(self) -> int:
+        return (self.frame_h - self.height) // 2
+
+    @property
+    def inferences(self) -> int:
+        """Model invocations needed per frame."""
+        return self.cols * self.rows
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the frame covered by at least one tile."""
+        return (self.width * self.height) / (self.frame_w * self.frame_h)
+
+    def origins(self) -> ndarray:
+        """(x, y) of each tile's top-left corner within the tiled image, in tile order."""
+        ys, xs = np.mgrid[0 : self.rows, 0 : self.cols]
+        return np.stack([xs.ravel() * self.step_x, ys.ravel() * self.step_y], axis=1)
+
+    def cropped(self) -> "TilePlan":
+        """The same grid placed in the tiled image, i.e. the frame cropped to the grid."""
+        return replace(self, frame_w=self.width, frame_h=self.height)
+
+    def tile_box(self, index: int) -> tuple[int, int, int, int]:
+        """(x, y, width, height) of a tile within the frame."""
+        if not 0 <= index < self.inferences:
+            raise IndexError(f"No tile {index} in a {self.cols}x{self.rows} grid")
+        row, col = divmod(index, self.cols)
+        return self.x_offset + col * self.step_x, self.y_offset + row * self.step_y, self.tile_size, self.tile_size
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str) -> "TilePlan":
+        return cls(**json.loads(text))
+
+
+def plan_tiles(
+    frame_w: int,
+    frame_h: int,
+    tile_size: int = TILE_SIZE,
+    overlap: int = 0,
+    cols: int | None = None,
+    rows: int | None = None,
+) -> TilePlan:
+    """Plan a tile grid for a frame.
+
+    With cols/rows given, the grid is a fixed size, spaced tile_size - overlap
+    apart and centered in the frame. Otherwise just enough tiles are used to
+    cover the whole frame with at least `overlap` pixels between neighbours;
+    rounding may leave a margin of a few pixels at the edges.
+    """
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"Overlap must be between 0 and {tile_size - 1}, got {overlap}")
+    stride = tile_size - overlap
+
+    def axis(frame_len: int, count: int | None) -> tuple[int, int]:
+        if count is not None:
+            return count, stride
+        if frame_len <= tile_size:
+            return 1, 0
+        count = math.ceil((frame_len - tile_size) / stride) + 1
+        return count, (frame_len - tile_size) // (count - 1)
+
+    cols, step_x = axis(frame_w, cols)
+    rows, step_y = axis(frame_h, rows)
+    plan = TilePlan(frame_w, frame_h, tile_size, cols, rows, step_x, step_y)
+    if plan.width > frame_w or plan.height > frame_h:
+        raise ValueError(f"{cols}x{rows} grid of {tile_size}px tiles does not fit a {frame_w}x{frame_h} frame")
+    return plan
+
+
+@dataclass
+class FrameDetection:
+    tile_index: int
+    confidence: float
+    bbox: tuple[float, float, float, float]  # ymin, xmin, ymax, xmax (pixels in the tiled image)
+
+
+def merge_detections(
+    plan: TilePlan,
+    results: list[list["Detection"]],
+    overlap_threshold: float = 0.5,
+) -> list[FrameDetection]:
+    """Map per-tile detections into image coordinates and suppress duplicates.
+
+    Boxes are compared by intersection over the smaller box, so a bird cut by
+    one tile's border is merged into the whole bird seen by its neighbour.
+    """
+    counts = [len(detections) for detections in results]
+    if not any(counts):
+        return []
+    tile_index = np.repeat(np.arange(len(results)), counts)
+    scores = np.array([d.confidence for detections in results for d in detections])
+    boxes = np.array([d.bbox for detections in results for d in detections], dtype=np.float64)
+
+    # Normalized tile coordinates to pixels in the tiled image
+    origins = plan.origins()[tile_index]
+    boxes = np.clip(boxes, 0.0, 1.0) * plan.tile_size
+    boxes[:, [0, 2]] += origins[:, 1:2]
+    boxes[:, [1, 3]] += origins[:, 0:1]
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        ymin = np.maximum(boxes[best, 0], boxes[rest, 0])
+        xmin = np.maximum(boxes[best, 1], boxes[rest, 1])
+        ymax = np.minimum(boxes[best, 2], boxes[rest, 2])
+        xmax = np.minimum(boxes[best, 3], boxes[rest, 3])
+        intersection = np.clip(ymax - ymin, 0, None) * np.clip(xmax - xmin, 0, None)
+        smaller = np.maximum(np.minimum(areas[best], areas[rest]), 1e-9)
+        order = rest[intersection / smaller < overlap_threshold]
+
+    return [
+        FrameDetection(
+            tile_index=int(tile_index[i]),
+            confidence=float(scores[i]),
+            bbox=tuple(boxes[i].tolist()),
+        )
+        for i in keep
+    ]
+
+
+class Tiler:
+    """Cuts frames into a grid of tiles without per-frame allocations.
+
+    Frames are read (or copied) into a buffer that is reused from frame to
+    frame, and the tiles are strided views into it. The image and tiles stay
+    valid until the next read/load overwrites the buffer. With cols/rows set
+    to None the grid is planned to cover the whole frame.
+    """
+
+    def __init__(
+        self,
+        tile_size: int = TILE_SIZE,
+        overlap: int = 0,
+        cols: int | None = GRID_COLS,
+        rows: int | None = GRID_ROWS,
+    ) -> None:
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.cols = cols
+        self.rows = rows
+        self.plan: TilePlan | None = None
+        self.frame: ndarray | None = None
+        self.image: ndarray | None = None
+        self.grid: ndarray | None = None
+        self.tiles: list[ndarray] = []
+        self.rgb = False
+        self._scaled: ndarray | None = None
+        self._source: ndarray | None = None
+
+    @classmethod
+    def for_tiling(cls, tiling: str, overlap: int = 0) -> "Tiler":
+        """Tiler for the --tiling option: "crop" (the fixed grid) or "full" (cover the whole frame)."""
+        if tiling == "full":
+            return cls(TILE_SIZE, overlap, cols=None, rows=None)
+        return cls(TILE_SIZE, overlap)
+
+    def read(self, cap: cv2.VideoCapture) -> bool:
+        """Read the next frame from a capture device into the buffer."""
+        ret, frame = cap.read(self.frame) if self.frame is not None else cap.read()
+        if not ret or frame is None:
+            return False
+        # OpenCV only writes into the buffer if the frame size matches, so keep whatever it returned
+        self.frame = frame
+        self._slice(frame)
+        return True
+
+    def load(self, image: ndarray) -> None:
+        """Copy an image (e.g. from a file) into the buffer."""
+        if self.frame is None or self.frame.shape != image.shape:
+            self.frame = np.empty_like(image)
+        np.copyto(self.frame, image)
+        self._slice(self.frame)
+
+    def _min_size(self) -> tuple[int, int]:
+        """Smallest frame the grid fits in."""
+        stride = self.tile_size - self.overlap
+        min_w = self.tile_size + ((self.cols or 1) - 1) * stride
+        min_h = self.tile_size + ((self.rows or 1) - 1) * stride
+        return min_w, min_h
+
+    def scaled_size(self, w: int, h: int) -> tuple[int, int]:
+        """Size a w x h frame is upscaled to so the grid fits."""
+        min_w, min_h = self._min_size()
+        if w >= min_w and h >= min_h:
+            return w, h
+        scale = max(min_w / w, min_h / h)
+        return math.ceil(w * scale), math.ceil(h * scale)
+
+    def plan_for(self, w: int, h: int) -> TilePlan:
+        """Tile plan used for a w x h frame."""
+        w, h = self.scaled_size(w, h)
+        if self.plan is None or (self.plan.frame_w, self.plan.frame_h) != (w, h):
+            self.plan = plan_tiles(w, h, self.tile_size, self.overlap, self.cols, self.rows)
+        return self.plan
+
+    def _slice(self, frame: ndarray) -> None:
+        h, w = frame.shape[:2]
+        plan = self.plan_for(w, h)
+
+        # If frame is too small, resize it up into a reusable buffer
+        if (plan.frame_w, plan.frame_h) != (w, h):
+            new_w, new_h = plan.frame_w, plan.frame_h
+            if self._scaled is None or self._scaled.shape[:2] != (new_h, new_w):
+                self._scaled = np.empty((new_h, new_w, 3), dtype=frame.dtype)
+            with timed("resize"):
+                cv2.resize(frame, (new_w, new_h), dst=self._scaled)
+            frame = self._scaled
+
+        self.rgb = False
+        if frame is self._source and self.image is not None:
+            return
+        self._source = frame
+
+        # Crop to the planned region, then view it as a (rows, cols, tile, tile, 3) grid
+        self.image = frame[
+            plan.y_offset : plan.y_offset + plan.height,
+            plan.x_offset : plan.x_offset + plan.width,
+        ]
+        row_stride, col_stride, channel_stride = self.image.strides
+        t = plan.tile_size
+        self.grid = as_strided(
+            self.image,
+            shape=(plan.rows, plan.cols, t, t, self.image.shape[2]),
+            strides=(plan.step_y * row_stride, plan.step_x * col_stride, row_stride, col_stride, channel_stride),
+            writeable=False,
+        )
+        self.tiles = [self.grid[row, col] for row in range(plan.rows) for col in range(plan.cols)]
+
+    def to_rgb(self) -> None:
+        """Convert the cropped image (and so every tile) from BGR to RGB in place."""
+        if self.image is not None and not self.rgb:
+            with timed("color"):
+                cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB, dst=self.image)
+            self.rgb = True
+
+    def to_bgr(self) -> None:
+        """Convert the cropped image back to BGR in place, e.g. before writing it out."""
+        if self.image is not None and self.rgb:
+            cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR, dst=self.image)
+            self.rgb = False
+
+    def copy_bgr(self, view: ndarray) -> ndarray:
+        """Return a BGR copy of the image or one of its tiles that outlives the buffer."""
+        if self.rgb:
+            return cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
+        return view.copy()
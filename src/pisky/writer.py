@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+from loguru import logger
+from numpy import ndarray
+
+from pisky.metrics import timed
+
+
+class ImageWriter:
+    """Encodes and writes JPEGs on background threads.
+
+    Submitted images go through a bounded queue. When it is full, submit()
+    either waits for a free slot (block=True) or drops the image, so a slow
+    SD card slows the capture loop down or loses images but never grows
+    memory use without bound. Images must not be modified after submission.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 16,
+        quality: int = 95,
+        block: bool = True,
+    ) -> None:
+        self.quality = quality
+        self.block = block
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue[tuple[Path, ndarray] | None] = queue.Queue(maxsize=max_pending)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"pisky-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, path: Path, image: ndarray) -> bool:
+        """Queue an image to be written. Returns False if it was dropped."""
+        try:
+            self._queue.put((path, image), block=self.block)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Write queue full, dropped {path.name}")
+            return False
+        return True
+
+    def _run(self) -> None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            path, image = item
+            try:
+                with timed("encode"):
+                    ok, encoded = cv2.imencode(path.suffix or ".jpg", image, params)
+                if not ok:
+                    raise RuntimeError("encoding failed")
+                # Write then rename so the server never sees a half-written file
+                with timed("write"):
+                    tmp_path = path.with_name(f".{path.name}.tmp")
+                    tmp_path.write_bytes(encoded.tobytes())
+                    os.replace(tmp_path, path)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Could not write {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued image is on disk."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending images and stop the writer threads."""
+        if not self._threads:
+            return
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self) -> "ImageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()